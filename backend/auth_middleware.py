@@ -1,15 +1,85 @@
 from flask import request, jsonify, g
 from services.supabase_service import SupabaseService
+from services.token_service import TokenService, UnknownSigningKeyError
+from services.token_cache import TokenCache
 from functools import wraps
+import jwt
 import logging
 
 logger = logging.getLogger(__name__)
 
+token_cache = TokenCache()
+remote_verifications = 0
+
+
+def verify_token(token: str):
+    """
+    Resolve the user a bearer token belongs to. Tokens are verified locally against
+    the cached signing keys when local verification is enabled, falling back to
+    Supabase Auth for unknown key IDs or when running in remote mode.
+
+    Args:
+        token (str): The bearer token presented by the client.
+
+    Returns:
+        Tuple of (user, user_id). The user is the token's claims when verified
+        locally, or the Supabase Auth user object when verified remotely.
+
+    Raises:
+        Exception: If the token is invalid or expired.
+    """
+    token_service = TokenService()
+
+    if token_service.local_enabled:
+        try:
+            claims = token_service.verify(token)
+            return claims, claims.get("sub")
+        except UnknownSigningKeyError as e:
+            logger.info(f"Falling back to remote token verification: {e}")
+
+    global remote_verifications
+    remote_verifications += 1
+
+    supabase = SupabaseService().get_client()
+    user_response = supabase.auth.get_user(token)
+    return user_response.user, user_response.user.id
+
+
+def _token_expiry(token: str):
+    """Read the expiry claim of an already verified token."""
+    try:
+        return jwt.decode(token, options={"verify_signature": False}).get("exp")
+    except jwt.InvalidTokenError:
+        return None
+
+
+def _bearer_token():
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        return None
+    return auth_header.split(" ")[1]
+
+
+def evict_token():
+    """Remove the current request's bearer token from every worker's verified token cache."""
+    token = _bearer_token()
+    if token:
+        token_cache.evict(token)
+
+
+def get_auth_stats() -> dict:
+    """Token cache counters alongside the number of Supabase Auth calls made."""
+    return {
+        **token_cache.stats(),
+        "remote_verifications": remote_verifications
+    }
+
 
 def check_auth():
     """
     This method provides the authentication middle-ware that protects the Flask routes.
-    Checks for the presence of a JWT token in the request headers and verifies it with Supabase Auth.
+    Checks for the presence of a JWT token in the request headers and verifies it, either
+    locally against Supabase's signing keys or with Supabase Auth.
     Ensures that only authenticated users can access protected routes as well as their own data.
 
     Returns:
@@ -28,16 +98,19 @@ def check_auth():
         return jsonify(error="Unauthorized - Missing token in header"), 401
 
     try:
-        # Verify token with Supabase Auth
-        supabase = SupabaseService().get_client()
-        user_response = supabase.auth.get_user(token)
+        cached = token_cache.get(token)
+        if cached:
+            user, user_id = cached
+        else:
+            user, user_id = verify_token(token)
+            token_cache.set(token, user, user_id, _token_expiry(token))
 
         # Store user in Flask's global context
-        g.user = user_response.user
-        g.user_id = user_response.user.id
+        g.user = user
+        g.user_id = user_id
 
         logger.info(
-            f"Token verified successfully for user ID: {user_response.user.id}")
+            f"Token verified successfully for user ID: {user_id}")
         return None  # Success
 
     except Exception as e:
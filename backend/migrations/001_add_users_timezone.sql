@@ -0,0 +1,5 @@
+-- Timezone reported by each user's device when it registers a push token, used to
+-- send daily reminders at the reminder time in the athlete's local timezone.
+-- Run once in the Supabase SQL editor. Users without a timezone are reminded in
+-- DEFAULT_REMINDER_TIMEZONE.
+ALTER TABLE users ADD COLUMN IF NOT EXISTS timezone text;
@@ -1,6 +1,19 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from auth_middleware import get_auth_stats
 from services.database_service import DatabaseService
-from services.scheduler_service import SchedulerService
+from services.query_cache import get_query_cache
+from services.background_queue import background_queue
+from services.notification_outbox import notification_outbox
+from services.push_receipt_service import push_receipt_service
+from services.scheduler_service import scheduler_service
+from services.job_service import job_service
+from services.job_lock import job_lock
+from services.event_buffer import session_event_buffer
+from services.report_rollup import report_rollup, REPORT_TABLES, ALL_TEAMS
+from services.report_export import (
+    COLUMNAR_FORMATS, COMPRESSIONS, columnar_available, columnar_stream, compress_stream, csv_stream,
+    iter_report_pages, json_stream, ndjson_stream, parse_columns)
+from itertools import chain
 from health_status import HealthStatus
 import logging
 from datetime import datetime, timedelta
@@ -11,35 +24,93 @@ db_service = DatabaseService()
 logger = logging.getLogger(__name__)
 
 
-@admin_bp.route('/trigger_reminders', methods=['POST'])
-def trigger_reminders():
-    """
-    An endpoint to be triggered by GitHub Actions, sending reminder notifications
-    to athletes who have not submitted their daily report.
-    """
-
+def _has_scheduler_secret() -> bool:
+    """Check the request carries the scheduler secret used by GitHub Actions."""
     # Get secret from request headers
     auth_header = request.headers.get('Authorization')
     secret = os.environ.get('SCHEDULER_SECRET')
 
     # Assert the secret exists and matches the expected value
-    if not auth_header or auth_header != f"Bearer {secret}":
+    return bool(secret and auth_header and auth_header == f"Bearer {secret}")
+
+
+@admin_bp.route('/trigger_reminders', methods=['POST'])
+def trigger_reminders():
+    """
+    An endpoint to be triggered by GitHub Actions, sending reminder notifications
+    to athletes who have not submitted their daily report. The reminders are sent
+    by a background job, whose progress is reported by /jobs/<job_id>.
+    """
+    if not _has_scheduler_secret():
         logger.warning("Unauthorized access to trigger_reminders endpoint")
         return jsonify(error="Unauthorized"), 401
 
     try:
         logger.info("Triggering scheduler to send daily reminders")
-        # Invoke scheduler to send notifications
-        scheduler_service = SchedulerService()
-        scheduler_service._send_daily_reminders()
-
-        logger.info("Daily reminders triggered successfully")
-        return jsonify(message="Daily reminders triggered successfully"), 200
+        job_id = job_service.submit(
+            "daily_reminders", scheduler_service._send_daily_reminders)
+
+        return jsonify(
+            message="Daily reminders queued",
+            job_id=job_id,
+            status_url=f"/api/admin/jobs/{job_id}"
+        ), 202
     except Exception as e:
         logger.error(f"Error triggering daily reminders: {e}")
         return jsonify(error=str(e)), 500
 
 
+@admin_bp.route('/rebuild_rollup', methods=['POST'])
+def rebuild_rollup():
+    """
+    An endpoint to be triggered daily by GitHub Actions, recounting the report
+    rollup from the database so any counts lost in between are restored. The
+    rebuild runs as a background job, whose progress is reported by /jobs/<job_id>.
+    """
+    if not _has_scheduler_secret():
+        logger.warning("Unauthorized access to rebuild_rollup endpoint")
+        return jsonify(error="Unauthorized"), 401
+
+    try:
+        job_id = job_service.submit("report_rollup_rebuild", report_rollup.rebuild_all)
+
+        return jsonify(
+            message="Report rollup rebuild queued",
+            job_id=job_id,
+            status_url=f"/api/admin/jobs/{job_id}"
+        ), 202
+    except Exception as e:
+        logger.error(f"Error triggering report rollup rebuild: {e}")
+        return jsonify(error=str(e)), 500
+
+
+@admin_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Reports the status, progress counts and duration of a background job."""
+    if not _has_scheduler_secret():
+        logger.warning("Unauthorized access to jobs endpoint")
+        return jsonify(error="Unauthorized"), 401
+
+    job = job_service.get(job_id)
+    if job is None:
+        return jsonify(error="Job not found"), 404
+    return jsonify(job), 200
+
+
+@admin_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Exposes in-process cache counters for monitoring."""
+    return jsonify(
+        auth_token_cache=get_auth_stats(),
+        query_cache=get_query_cache().stats(),
+        background_queue=background_queue.stats(),
+        notification_outbox=notification_outbox.stats(),
+        push_receipts=push_receipt_service.stats(),
+        session_event_buffer=session_event_buffer.stats(),
+        daily_reminders_last_run=job_lock.latest_run("daily_report_reminders:")
+    ), 200
+
+
 @admin_bp.route('/all_athletes', methods=['GET'])
 def get_all_athletes():
     """Fetches all athlete data from database for admin interface"""
@@ -90,13 +161,11 @@ def get_all_athletes():
 def get_all_coaches():
     """Fetches all coach data from database for admin interface"""
     try:
-        response = db_service.fetch(
-            table="coaches"
-        )
+        num_coaches = db_service.count(table="coaches")
 
-        if response and response.data:
-            logger.info("Fetched coaches for admin")
-            return jsonify({"num_coaches": len(response.data)}), 200
+        if num_coaches:
+            logger.info("Counted coaches for admin")
+            return jsonify({"num_coaches": num_coaches}), 200
         else:
             logger.warning("No coach data found")
             return jsonify(message="No coach data found"), 200
@@ -106,20 +175,52 @@ def get_all_coaches():
         return jsonify(error=str(e)), 500
 
 
+def _outcome(status: str) -> str:
+    """Summary label for a report's new_availability."""
+    if status == HealthStatus.AMBER:
+        return "At Risk"
+    elif status == HealthStatus.RED:
+        return "Injured"
+    return "Healthy"
+
+
 @admin_bp.route('/all_reports/', methods=['GET'])
 def get_all_reports():
     """
     Fetches all report data from database for admin interface,
-    providing a summary of report outcomes over the past week
+    providing a summary of report outcomes over the past week.
+    summary_only=true skips fetching the reports themselves and reads the
+    summary from the report rollup once it has been built. Otherwise the
+    summary is counted from the fetched reports.
     """
     days = request.args.get('days', default=7, type=int)
+    summary_only = request.args.get('summary_only', default="false").lower() == "true"
 
     now = datetime.now()
     today = datetime.today()
     threshold = now - timedelta(days=days)
     reports_summary = {}
 
+    # For each of the past number of days, starting from today
+    for i in range(0, days):
+        day = (now - timedelta(days=i)).strftime("%Y-%m-%d")
+        reports_summary[day] = {
+            "Healthy": 0, "At Risk": 0, "Injured": 0}
+
     try:
+        if summary_only and report_rollup.is_built("report"):
+            num_reports = 0
+            for row in report_rollup.rows("report", min(reports_summary, default="")):
+                summary = reports_summary.get(row['day'])
+                if summary is not None:
+                    summary[_outcome(row['status'])] += row['count']
+                    num_reports += row['count']
+
+            return jsonify({
+                "num_reports": num_reports,
+                "reports_summary": reports_summary
+            }), 200
+
         response = db_service.fetch(
             table="reports",
             filters={"created_at": f"gte.{threshold}"},
@@ -129,34 +230,28 @@ def get_all_reports():
 
         if response and response.data:
             logger.info("Fetched reports for admin")
-            # For each of the past number of days...
-            for i in range(0, days):
-                # Start from today, proceed backwards
-                day = (now - timedelta(days=i)).strftime("%Y-%m-%d")
-                reports_summary[day] = {
-                    "Healthy": 0, "At Risk": 0, "Injured": 0}
-
-                # Acquire all reports created on that day
-                reports = [
-                    r for r in response.data if r['created_at'].startswith(day)]
-
-                # Summarise outcomes of the reports
-                for report in reports:
-                    if report.get('new_availability') == HealthStatus.AMBER:
-                        reports_summary[day]["At Risk"] += 1
-                    elif report.get('new_availability') == HealthStatus.RED:
-                        reports_summary[day]["Injured"] += 1
-                    else:
-                        reports_summary[day]["Healthy"] += 1
-
-                    # Calculate athlete age from dob
-                    dob = report.get('athletes').get('users').get('dob')
-                    age = (today - datetime.strptime(dob, "%Y-%m-%d")).days // 365
-                    report['athlete_age'] = age
-
-                    # Include athlete's gender
-                    report['gender'] = report.get(
-                        'athletes').get('users').get('gender')
+
+            # Ages are calculated once per athlete rather than once per report
+            ages = {}
+
+            # Summarise outcomes of the reports in a single pass, keyed by day
+            for report in response.data:
+                summary = reports_summary.get(report['created_at'][:10])
+                if summary is not None:
+                    summary[_outcome(report.get('new_availability'))] += 1
+
+                user = (report.get('athletes') or {}).get('users') or {}
+
+                # Calculate athlete age from dob
+                athlete_id = report.get('athlete_id')
+                if athlete_id not in ages:
+                    dob = user.get('dob')
+                    ages[athlete_id] = (
+                        today - datetime.strptime(dob, "%Y-%m-%d")).days // 365 if dob else None
+                report['athlete_age'] = ages[athlete_id]
+
+                # Include athlete's gender
+                report['gender'] = user.get('gender')
 
             return jsonify({
                 "num_reports": len(response.data),
@@ -173,6 +268,37 @@ def get_all_reports():
         return jsonify(error=str(e)), 500
 
 
+@admin_bp.route('/report_rollup', methods=['GET'])
+def get_report_rollup():
+    """
+    Fetches daily report counts by status, age band and gender from the report
+    rollup, for all teams or a single team.
+
+    Parameters:
+        days (int): Number of past days to include. (default 30)
+        type (str): "report" or "followup". (default "report")
+        team_id (str): Only count reports from this team's athletes. (default all teams)
+    """
+    days = request.args.get('days', default=30, type=int)
+    report_type = request.args.get('type', default="report")
+    team_id = request.args.get('team_id', default=ALL_TEAMS)
+
+    if report_type not in REPORT_TABLES:
+        return jsonify(error=f"Unknown report type {report_type}"), 400
+
+    try:
+        if not report_rollup.is_built(report_type):
+            return jsonify(message="Report rollup has not been built"), 503
+
+        since = (datetime.now() - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+        rows = report_rollup.rows(report_type, since, team_id)
+        return jsonify(rows=rows, num_reports=sum(row["count"] for row in rows)), 200
+
+    except Exception as e:
+        logger.error(f"Error fetching report rollup: {e}")
+        return jsonify(error=str(e)), 500
+
+
 @admin_bp.route('/all_followup_reports/', methods=['GET'])
 def get_all_followups():
     """Fetches follow-up report submissions for admin interface."""
@@ -235,31 +361,91 @@ def get_activity_data():
         return jsonify(error=str(e)), 500
 
 
+EXPORT_FORMATS = {
+    "json": ("application/json", ".json"),
+    "ndjson": ("application/x-ndjson", ".ndjson"),
+    "csv": ("text/csv", ".csv"),
+    **COLUMNAR_FORMATS,
+}
+
+# JSON key of the exported rows for each report type
+EXPORT_KEYS = {"report": "reports", "followup": "followups"}
+
+
 @admin_bp.route('/export_reports', methods=['GET'])
 def export_reports():
-    """Triggers export of report data to CSV for admin interface"""
-    try:
-        # Fetch all reports as well as associated athlete gender and age
-        response = db_service.fetch(
-            table="reports",
-            select="*,athletes(users(dob,gender))"
-        )
+    """
+    Triggers export of report data for admin interface. Reports, along with the
+    athlete's gender and age, are streamed a page at a time so memory use does not
+    grow with the number of reports.
+
+    Parameters:
+        type (str): "report" or "followup". (default "report")
+        format (str): "json" ({"reports": [...]}), "ndjson", "csv", or the columnar
+            "parquet" and "arrow" (an Arrow IPC stream). (default "json")
+        compression (str): "gzip" or "zstd" to download a compressed file. Columnar
+            formats are always compressed internally. (default None)
+        from (str): Only include reports created on or after this date. (default None)
+        to (str): Only include reports created on or before this date. (default None)
+        columns (str): Comma separated columns to include. (default all columns)
+    """
+    report_type = request.args.get('type', default="report")
+    export_format = request.args.get('format', default="json")
+    compression = request.args.get('compression')
+
+    if report_type not in REPORT_TABLES:
+        return jsonify(error=f"Unknown report type {report_type}"), 400
+    if export_format not in EXPORT_FORMATS:
+        return jsonify(error=f"Unsupported format {export_format}"), 400
+    if compression and (compression not in COMPRESSIONS or export_format in COLUMNAR_FORMATS):
+        return jsonify(error=f"Unsupported compression {compression} for {export_format}"), 400
+    if export_format in COLUMNAR_FORMATS and not columnar_available():
+        logger.error("pyarrow is not installed, columnar exports are unavailable")
+        return jsonify(error=f"{export_format} export is not available"), 501
 
-        today = datetime.today()
-        for report in response.data:
-            dob = report.get('athletes').get('users').get('dob')
-            age = (today - datetime.strptime(dob, "%Y-%m-%d")).days // 365
-            report['athlete_age'] = age
+    try:
+        columns = parse_columns(request.args.get('columns'))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
 
-            report['gender'] = report.get(
-                'athletes').get('users').get('gender')
+    try:
+        table = REPORT_TABLES[report_type]
+        pages = iter_report_pages(
+            db_service,
+            table,
+            since=request.args.get('from'),
+            until=request.args.get('to'),
+            columns=columns
+        )
 
-        if response and response.data:
-            logger.info("Fetched reports for export")
-            return jsonify({"reports": response.data}), 200
-        else:
+        # Fetch the first page before responding so query errors return a 500
+        first_page = next(pages, None)
+        if first_page is None:
             logger.warning("No report data found for export")
             return jsonify(message="No report data found for export"), 200
+        pages = chain([first_page], pages)
+
+        if export_format in COLUMNAR_FORMATS:
+            body = columnar_stream(pages, export_format, table)
+        elif export_format == "csv":
+            body = csv_stream(pages, columns)
+        elif export_format == "ndjson":
+            body = ndjson_stream(pages)
+        else:
+            body = json_stream(pages, EXPORT_KEYS[report_type])
+
+        mimetype, extension = EXPORT_FORMATS[export_format]
+        if compression:
+            body = compress_stream(body, compression)
+            mimetype, compressed_extension = COMPRESSIONS[compression]
+            extension += compressed_extension
+
+        logger.info(f"Streaming {table} export as {export_format}")
+        return Response(
+            stream_with_context(body),
+            mimetype=mimetype,
+            headers={"Content-Disposition": f"attachment; filename={table}{extension}"}
+        )
     except Exception as e:
         logger.error(f"Error retrieving reports for export: {e}")
         return jsonify(error=str(e)), 500
@@ -22,9 +22,11 @@ def get_team_details():
     """
 
     try:
+        # Fetch team details for all teams the athlete is in
         athlete_teams = db_service.fetch(
             table="athlete_teams",
-            filters={"athlete_id": g.user_id})
+            filters={"athlete_id": g.user_id},
+            select=db_service.embed("teams", "team_id", "sport", "team_name", "coach_id"))
 
         if not athlete_teams or not athlete_teams.data:
             return jsonify(
@@ -32,24 +34,26 @@ def get_team_details():
                 team_details=None
             ), 200
 
+        team_rows = [athlete_team.get("teams")
+                     for athlete_team in athlete_teams.data if athlete_team.get("teams")]
+
+        # Fetch coach details for every team in one request
+        coaches = db_service.fetch_many(
+            table="users",
+            column="id",
+            ids=[team.get("coach_id") for team in team_rows],
+            select="id, name")
+        coach_names = {coach.get("id"): coach.get("name")
+                       for coach in coaches.data}
 
-        # Fetch team details for all teams the athlete is in
         teams = []
-        for athlete_team in athlete_teams.data:
-            response = db_service.fetch(
-                "teams", {"team_id": athlete_team.get("team_id")})
-
-            if response and response.data:
-                for team in response.data:
-                    # Fetch coach details
-                    coach = db_service.fetch(
-                        "users", {"id": team.get("coach_id")})
-                    teams.append({
-                        "team_id": team.get("team_id"),
-                        "sport": team.get("sport"),
-                        "team_name": team.get("team_name"),
-                        "coach": coach.data[0].get("name") if coach and coach.data else None,
-                    })
+        for team in team_rows:
+            teams.append({
+                "team_id": team.get("team_id"),
+                "sport": team.get("sport"),
+                "team_name": team.get("team_name"),
+                "coach": coach_names.get(team.get("coach_id")),
+            })
 
         if teams:
             logger.info(f"Fetched teams for athlete {g.user_id}")
@@ -1,4 +1,5 @@
 from flask import Blueprint, request, jsonify, g
+from auth_middleware import evict_token, token_cache
 from services.auth_service import AuthService
 from services.database_service import DatabaseService
 from services.session_service import SessionService
@@ -105,8 +106,12 @@ def login():
             # Create a new session for the user
             user_id = response.user.id
 
-            # Double-check user exists before creating session
-            user_check = db_service.fetch("users", {"id": user_id})
+            # Double-check user exists before creating session. The row fetched
+            # by email already confirms this when the IDs match.
+            if user_data.data[0].get("id") == user_id:
+                user_check = user_data
+            else:
+                user_check = db_service.fetch("users", {"id": user_id})
             if not user_check.data or len(user_check.data) == 0:
                 logger.error(
                     f"User ID {user_id} not found in database despite email match")
@@ -240,6 +245,9 @@ def logout():
         # End the session
         session_service.end_session(session)
 
+        # Token should no longer be accepted from the cache
+        evict_token()
+
         # Log logout event
         session_service.log_event(
             session_id=session,
@@ -266,6 +274,7 @@ def delete_account():
         response = db_service.delete("users", {"id": uuid})
         if response:
             auth_service.delete_account(uuid)
+            token_cache.evict_user(uuid)
             logger.info("Account deleted by auth service")
             return jsonify(message="Account deleted by auth service"), 200
         else:
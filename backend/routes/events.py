@@ -192,40 +192,40 @@ def get_team_events(team_id):
         athletes_response = db_service.fetch(
             table="athlete_teams",
             filters={"team_id": team_id},
-            select={"athlete_id"})
+            select="athlete_id")
 
         if athletes_response and athletes_response.data:
-            events = []
+            athlete_ids = [athlete.get("athlete_id")
+                           for athlete in athletes_response.data]
             logger.info(f"Fetching events for team {team_id}")
 
-            for athlete in athletes_response.data:
-                # Only acquire events occuring within the next 3 days
-                events_response = db_service.fetch(
-                    table="events",
-                    filters={
-                        "athlete_id": athlete.get("athlete_id"),
-                        "event_date": f"gte.{datetime.now().strftime('%Y-%m-%d')}",
-                        "event_date": f"lte.{(datetime.now() + timedelta(days=3)).strftime('%Y-%m-%d')}"
-                    }
-                )
-                if events_response and events_response.data:
-                    logger.info(
-                        f"Fetched events for {athlete.get('athlete_id')}")
-
-                    for event in events_response.data:
-                        events.append({
-                            "event_id": event.get("id"),
-                            "title": event.get("title"),
-                            "sport": event.get("sport"),
-                            "event_date": event.get("event_date"),
-                            "start_time": event.get("start_time"),
-                            "end_time": event.get("end_time"),
-                            "type": event.get("type"),
-                        })
+            # Only acquire events occuring within the next 3 days
+            today = datetime.now()
+            events_response = db_service.fetch(
+                table="events",
+                filters={
+                    "event_date": [
+                        f"gte.{today.strftime('%Y-%m-%d')}",
+                        f"lte.{(today + timedelta(days=3)).strftime('%Y-%m-%d')}"
+                    ]
+                },
+                modifiers={
+                    "in_": ("athlete_id", athlete_ids),
+                    "order": "event_date"
+                }
+            )
 
-                else:
-                    logger.info(
-                        f"No events found for {athlete.get('athlete_id')}")
+            events = []
+            for event in events_response.data if events_response else []:
+                events.append({
+                    "event_id": event.get("id"),
+                    "title": event.get("title"),
+                    "sport": event.get("sport"),
+                    "event_date": event.get("event_date"),
+                    "start_time": event.get("start_time"),
+                    "end_time": event.get("end_time"),
+                    "type": event.get("type"),
+                })
 
             logger.info(f"Fetched team events for team {team_id}")
             return jsonify(team_events=events), 200
@@ -1,20 +1,97 @@
 from flask import Blueprint, request, jsonify, g
 from services.database_service import DatabaseService
-from services.notification_service import NotificationService
 from services.session_service import SessionService
+from services.background_queue import background_queue
+from services.notification_outbox import notification_outbox
+from services.report_rollup import report_rollup
 import logging
 from health_status import HealthStatus
 from datetime import datetime, timedelta, timezone
 import re
+import uuid
 from injury_codes import generate_code
 
 db_service = DatabaseService()
 session_service = SessionService()
-notification_service = NotificationService()
 health_bp = Blueprint('health', __name__)
 logger = logging.getLogger(__name__)
 
 
+def notify_coaches_of_injury(payload: dict):
+    """
+    Background job that sends a push notification to the coach of every team
+    the injured athlete belongs to.
+
+    Args:
+        payload (dict): The athlete's ID and name, and the ID of the report.
+    """
+    # Fetch coaches associated with athlete's teams
+    athlete_response = db_service.fetch(
+        table="athlete_teams",
+        filters={"athlete_id": payload.get("athlete_id")},
+        select="teams(coach_id)"
+    )
+
+    if athlete_response and athlete_response.data:
+        coach_ids = set()
+        for item in athlete_response.data:
+            if item.get('teams') and item['teams'].get('coach_id'):
+                coach_ids.add(item['teams']['coach_id'])
+
+        # Fetch push tokens of each coach
+        if coach_ids:
+            coach_response = db_service.fetch(
+                table="users",
+                modifiers={"in_": ("id", list(coach_ids))},
+                select="push_token"
+            )
+
+            # Recorded in the outbox, which delivers and retries them. Keys are
+            # per report and coach, so replaying this job never notifies twice.
+            if coach_response and coach_response.data:
+                queued = 0
+                for coach in coach_response.data:
+                    push_token = coach.get("push_token")
+                    if push_token and notification_outbox.enqueue(
+                        idempotency_key=f"coach_injury_alert:{payload.get('report_id')}:{push_token}",
+                        push_token=push_token,
+                        title="An athlete is injured!",
+                        body=f"{payload.get('athlete_name')} suffered an injury and is expecting absence. Tap to view more details."
+                    ):
+                        queued += 1
+                logger.info(
+                    f"Injury alert for athlete {payload.get('athlete_id')} queued for {queued} coach(es)")
+
+
+def update_report_rollup(payload: dict):
+    """
+    Background job that counts a newly submitted report in the daily report rollup.
+
+    Args:
+        payload (dict): The report type, athlete ID, status and creation time.
+    """
+    report_rollup.record(
+        payload.get("report_type"),
+        payload.get("athlete_id"),
+        payload.get("status"),
+        payload.get("created_at")
+    )
+
+
+def _enqueue_rollup(report_type: str, inserted: dict):
+    """Queue the rollup update for a report, using the row returned by the insert."""
+    background_queue.enqueue("report_rollup", {
+        "report_type": report_type,
+        "athlete_id": inserted.get("athlete_id"),
+        "status": inserted.get("new_availability"),
+        "created_at": inserted.get("created_at")
+    })
+
+
+background_queue.register("coach_injury_alert", notify_coaches_of_injury)
+background_queue.register("report_rollup", update_report_rollup)
+
+
 @health_bp.route('/report', methods=['POST'])
 def health_report():
     """
@@ -37,6 +114,7 @@ def health_report():
         logger.info(f"Received new health report: {report_data}")
 
         estimated_recovery_date = None
+        notify_coaches = False
 
         # Healthy athlete's submission
         proposed_status = HealthStatus.GREEN
@@ -59,37 +137,8 @@ def health_report():
                 elif restriction == "Training & Competing":
                     proposed_status = HealthStatus.RED
 
-                # Fetch coaches associated with athlete's teams
-                athlete_response = db_service.fetch(
-                    table="athlete_teams",
-                    filters={"athlete_id": g.user_id},
-                    select="teams(coach_id)"
-                )
-
-                if athlete_response and athlete_response.data:
-                    coach_ids = set()
-                    for item in athlete_response.data:
-                        if item.get('teams') and item['teams'].get('coach_id'):
-                            coach_ids.add(item['teams']['coach_id'])
-
-                    # Fetch push tokens of each coach
-                    if coach_ids:
-                        coach_response = db_service.fetch(
-                            table="users",
-                            modifiers={"in_": ("id", list(coach_ids))},
-                            select="push_token"
-                        )
-
-                        # Notify coaches of athlete's injury
-                        if coach_response and coach_response.data:
-                            for coach in coach_response.data:
-                                push_token = coach.get("push_token")
-                                if push_token:
-                                    notification_service.send_notification(
-                                        push_token=push_token,
-                                        title="An athlete is injured!",
-                                        body=f"{report_data.get('user_data').get('name')} suffered an injury and is expecting absence. Tap to view more details."
-                                    )
+                # Coaches are notified once the report has been saved
+                notify_coaches = True
 
             injury_location = report_data['answers'].get('injury_location')
             injury_type = report_data['answers'].get('injury_type')
@@ -171,8 +220,25 @@ def health_report():
             "consulted": report_data['answers'].get('consulted'),
             "comments": report_data['answers'].get('comments'),
         }
-        db_service.insert("reports", data=submission_data)
+        report_response = db_service.insert("reports", data=submission_data)
         logger.info("Inserted new report to database")
+
+        _enqueue_rollup("report", report_response.data[0] if report_response.data else {
+            **submission_data, "new_availability": proposed_status.value})
+
+        # Notify coaches of athlete's injury in the background
+        if notify_coaches:
+            report_id = report_response.data[0].get("report_id") if report_response.data else None
+            if report_id is None:
+                # Alerts are deduplicated per report, so every alert needs its own key
+                report_id = f"unknown-{uuid.uuid4()}"
+                logger.error(f"Report insert returned no report_id, alerting coaches as {report_id}")
+            background_queue.enqueue("coach_injury_alert", {
+                "report_id": report_id,
+                "athlete_id": g.user_id,
+                "athlete_name": (report_data.get('user_data') or {}).get('name')
+            })
+
         return jsonify(message="Health report submitted successfully"), 201
 
     except Exception as e:
@@ -261,11 +327,14 @@ def followup_report():
 
         # Submit follow-up report to database
         try:
-            db_service.insert(
+            followup_response = db_service.insert(
                 table="followup_reports",
                 data=submission_data
             )
             logger.info("Follow-up report submitted successfully")
+
+            _enqueue_rollup(
+                "followup", followup_response.data[0] if followup_response.data else submission_data)
             return jsonify(message="Follow-up report submitted successfully"), 200
 
         except Exception as e:
@@ -289,7 +358,7 @@ def get_status():
         user = db_service.fetch("athletes", filters={"id": g.user_id})
 
         if user.data:
-            reports = db_service.fetch(
+            reports_count = db_service.count(
                 table="reports",
                 filters={"athlete_id": g.user_id}
             )
@@ -308,7 +377,7 @@ def get_status():
 
             return jsonify(
                 user_id=g.user_id,
-                reports_count=len(reports.data) if reports.data else 0,
+                reports_count=reports_count,
                 health_status=health_status_value,
                 injury_date=injury_date,
                 estimated_recovery_date=estimated_recovery_date,
@@ -355,6 +424,36 @@ def check_report_due():
         return jsonify(error=str(e)), 500
 
 
+def _time_since(created_at: str, now: datetime) -> str:
+    """
+    Humanise the time elapsed since a report was submitted.
+
+    Args:
+        created_at (str): The report's ISO formatted creation timestamp.
+        now (datetime): The time to measure against.
+
+    Returns:
+        String such as "5 minutes ago", "2 hours ago" or "3 days ago".
+    """
+    recent = datetime.fromisoformat(
+        # Account for timezone formatting
+        created_at.replace('+00:00', ''))
+
+    # Report submitted today - measure in hours/minutes
+    if now.date() == recent.date():
+        time_diff = now - recent
+        total_minutes = int(time_diff.total_seconds() / 60)
+
+        if total_minutes < 60:
+            return f"{total_minutes} minutes ago"
+
+        hours = total_minutes // 60
+        return f"{hours} hour{'s' if hours != 1 else ''} ago"
+
+    # More than a day ago - measure in days
+    return f"{(now.date() - recent.date()).days} days ago"
+
+
 @health_bp.route('/get_recent_report/<user_id>', methods=['GET'])
 def get_recent_report(user_id):
     """
@@ -372,30 +471,16 @@ def get_recent_report(user_id):
         response = db_service.fetch(
             "reports",
             filters={"athlete_id": user_id},
-            modifiers={"order": {"column": "created_at", "desc": True}}
+            modifiers={
+                "order": {"column": "created_at", "desc": True},
+                "limit": 1
+            },
+            select="created_at"
         )
         if response and response.data:
             logger.info("Fetching most recent report for each athlete")
-            now = datetime.now()
-            recent = datetime.fromisoformat(
-                # Account for timezone formatting
-                response.data[0].get('created_at').replace('+00:00', ''))
-            time_since = ""
-
-            # Report submitted today - measure in hours/minutes
-            if now.date() == recent.date():
-                time_diff = now - recent
-                total_minutes = int(time_diff.total_seconds() / 60)
-
-                if total_minutes < 60:
-                    time_since = f"{total_minutes} minutes ago"
-                else:
-                    hours = total_minutes // 60
-                    time_since = f"{hours} hour{'s' if total_minutes != 1 else ''} ago"
-
-            # More than a day ago - measure in days
-            else:
-                time_since = f"{(now.date() - recent.date()).days} days ago"
+            time_since = _time_since(
+                response.data[0].get('created_at'), datetime.now())
 
             logger.info(f"Fetched recent reports")
             return jsonify(time_since), 200
@@ -406,3 +491,53 @@ def get_recent_report(user_id):
     except Exception as e:
         logger.error(f"Error retrieving recent report for user {user_id}: {e}")
         return jsonify(error=str(e)), 500
+
+
+@health_bp.route('/recent_reports/<team_id>', methods=['GET'])
+def get_team_recent_reports(team_id):
+    """
+    Acquires the most recent report of every athlete on a team in a single
+    query, taking only the newest report row per athlete.
+
+    Parameters:
+        team_id (uuid): The team to be queried
+
+    Returns:
+        JSON response mapping each athlete ID to their latest report
+        timestamp and the time since it was submitted, or error.
+    """
+    try:
+        response = db_service.fetch(
+            table="athlete_teams",
+            filters={"team_id": team_id},
+            modifiers={
+                "order": {"column": "created_at", "desc": True, "foreign_table": "athletes.reports"},
+                "limit": {"size": 1, "foreign_table": "athletes.reports"}
+            },
+            select="athlete_id, athletes(reports(created_at))"
+        )
+
+        now = datetime.now()
+        recent_reports = {}
+        for athlete_team in response.data if response else []:
+            athlete = athlete_team.get("athletes") or {}
+            reports = athlete.get("reports") or []
+
+            if reports:
+                created_at = reports[0].get("created_at")
+                recent_reports[athlete_team.get("athlete_id")] = {
+                    "created_at": created_at,
+                    "time_since": _time_since(created_at, now)
+                }
+            else:
+                recent_reports[athlete_team.get("athlete_id")] = {
+                    "created_at": None,
+                    "time_since": "None submitted"
+                }
+
+        logger.info(f"Fetched recent reports for team {team_id}")
+        return jsonify(recent_reports=recent_reports), 200
+
+    except Exception as e:
+        logger.error(f"Error retrieving recent reports for team {team_id}: {e}")
+        return jsonify(error=str(e)), 500
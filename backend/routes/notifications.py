@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify, g
 from services.database_service import DatabaseService
+from zoneinfo import ZoneInfo
 import logging
 
 notifications_bp = Blueprint('notifications', __name__)
@@ -10,12 +11,14 @@ logger = logging.getLogger(__name__)
 @notifications_bp.route('/register', methods=['POST'])
 def register_push_token():
     """
-    Register or update a push token for a user.
+    Register or update a push token for a user, along with the device's timezone
+    so daily reminders arrive at a sensible local time.
 
     Expected JSON body:
     {
         "user_id": "uuid",
-        "push_token": "ExponentPushToken[...]"
+        "push_token": "ExponentPushToken[...]",
+        "timezone": "Europe/Dublin" (optional)
     }
     """
     try:
@@ -33,19 +36,39 @@ def register_push_token():
             logger.warning(f"Invalid push token format: {push_token}")
             return jsonify({"error": "Invalid push token format"}), 400
 
+        timezone_name = data.get('timezone')
+        if timezone_name:
+            try:
+                ZoneInfo(timezone_name)
+            except (ValueError, KeyError):
+                logger.warning(f"Invalid timezone: {timezone_name}")
+                return jsonify({"error": "Invalid timezone"}), 400
+
         # Update user's push token in database
         response = db_service.update(
             table='users',
             data={'push_token': push_token},
             filters={'id': user_id}
         )
-        if response:
-            logger.info(f"Push token registered for user {user_id}")
-            return jsonify({"success": True, "message": "Push token registered"}), 200
-        else:
+        if not response:
             logger.error(f"Failed to register push token for user {user_id}")
             return jsonify({"error": "Failed to register push token"}), 500
 
+        # Stored separately so the push token is saved even if the timezone column
+        # has not been added yet (migrations/001_add_users_timezone.sql)
+        if timezone_name:
+            try:
+                db_service.update(
+                    table='users',
+                    data={'timezone': timezone_name},
+                    filters={'id': user_id}
+                )
+            except Exception as e:
+                logger.warning(f"Could not store timezone for user {user_id}: {e}")
+
+        logger.info(f"Push token registered for user {user_id}")
+        return jsonify({"success": True, "message": "Push token registered"}), 200
+
     except Exception as e:
         logger.error(f"Error registering push token: {e}")
         return jsonify({"error": str(e)}), 500
@@ -1,13 +1,24 @@
 from flask import Blueprint, request, jsonify
 from services.database_service import DatabaseService
 from services.session_service import SessionService
+import io
+import json
 import logging
+import os
+import msgpack
+import zstandard
 
 session_bp = Blueprint('session', __name__)
 db_service = DatabaseService()
 session_service = SessionService()
 logger = logging.getLogger(__name__)
 
+# Limits for /log_events, applied after decompression
+LOG_EVENTS_MAX_BATCH = int(os.getenv("LOG_EVENTS_MAX_BATCH", 500))
+LOG_EVENTS_MAX_BYTES = int(os.getenv("LOG_EVENTS_MAX_BYTES", 1024 * 1024))
+
+MSGPACK_CONTENT_TYPES = {"application/msgpack", "application/x-msgpack"}
+
 
 @session_bp.route('/log_event', methods=['POST'])
 def log_event():
@@ -30,3 +41,76 @@ def log_event():
     except Exception as e:
         logger.error(f"Error logging event: {e}")
         return jsonify(error=str(e)), 500
+
+
+def _decode_events(body: bytes, content_type: str, content_encoding: str):
+    """
+    Decode a /log_events body, which may be zstd compressed (Content-Encoding: zstd)
+    and JSON or msgpack encoded. The decoded body is a list of events, or an
+    object with an "events" list.
+
+    Raises:
+        ValueError: If the body cannot be decoded or is too large.
+    """
+    if content_encoding == "zstd":
+        try:
+            with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body)) as reader:
+                body = reader.read(LOG_EVENTS_MAX_BYTES + 1)
+        except zstandard.ZstdError as e:
+            raise ValueError(f"Invalid zstd body: {e}")
+    elif content_encoding not in ("", "identity"):
+        raise ValueError(f"Unsupported content encoding {content_encoding}")
+
+    if len(body) > LOG_EVENTS_MAX_BYTES:
+        raise ValueError("Request body too large")
+
+    try:
+        if content_type in MSGPACK_CONTENT_TYPES:
+            payload = msgpack.unpackb(body, raw=False)
+        else:
+            payload = json.loads(body)
+    except (msgpack.UnpackException, ValueError) as e:
+        raise ValueError(f"Invalid request body: {e}")
+
+    events = payload.get("events") if isinstance(payload, dict) else payload
+    if not isinstance(events, list):
+        raise ValueError("Expected a list of events")
+    return events
+
+
+@session_bp.route('/log_events', methods=['POST'])
+def log_events():
+    """
+    Log a batch of events in one request. The body is a list of events, as accepted
+    by /log_event, or {"events": [...]}, encoded as JSON or msgpack
+    (Content-Type: application/msgpack) and optionally zstd compressed
+    (Content-Encoding: zstd).
+
+    Returns:
+        JSON object with accepted and rejected counts and a result for each event.
+    """
+    try:
+        events = _decode_events(
+            request.get_data(),
+            request.mimetype,
+            (request.headers.get('Content-Encoding') or "").lower()
+        )
+    except ValueError as e:
+        logger.warning(f"Rejected event batch: {e}")
+        return jsonify(error=str(e)), 400
+
+    if len(events) > LOG_EVENTS_MAX_BATCH:
+        return jsonify(error=f"At most {LOG_EVENTS_MAX_BATCH} events per batch"), 413
+
+    try:
+        results = session_service.log_events(events)
+        accepted = sum(1 for result in results if result["status"] == "accepted")
+        return jsonify(
+            accepted=accepted,
+            rejected=len(results) - accepted,
+            results=results
+        ), 200
+
+    except Exception as e:
+        logger.error(f"Error logging events: {e}")
+        return jsonify(error=str(e)), 500
@@ -23,20 +23,22 @@ def get_teams():
         response = db_service.fetch("teams")
 
         if response:
+            # Resolve every coach's name in one request
+            coaches = db_service.fetch_many(
+                table="users",
+                column="id",
+                ids=[team.get("coach_id") for team in response.data],
+                select="id, name")
+            coach_names = {coach.get("id"): coach.get("name")
+                           for coach in coaches.data}
+
             teams = []
             for team in response.data:
-                coach_data = db_service.fetch(
-                    table="users",
-                    filters={"id": team.get("coach_id")})
-
-                coach_name = coach_data.data[0].get(
-                    "name") if coach_data and coach_data.data else None
-
                 teams.append({
                     "team_id": team.get("team_id"),
                     "team_name": team.get("team_name"),
                     "sport": team.get("sport"),
-                    "coach_name": coach_name
+                    "coach_name": coach_names.get(team.get("coach_id"))
                 })
 
             return jsonify(teams=teams), 200
@@ -58,22 +60,21 @@ def fetch_coach_teams():
         JSON response with a list of teams or error message.
     """
     try:
-        response = db_service.fetch("teams", filters={"coach_id": g.user_id})
+        # Count each team's athletes server-side alongside the team details
+        response = db_service.fetch(
+            "teams",
+            filters={"coach_id": g.user_id},
+            select=f"*, {db_service.embed('athlete_teams', 'count')}")
 
         if response:
             teams = []
-
-            # Fetch athletes for each team
             for team in response.data:
-                players = db_service.fetch(
-                    table="athlete_teams",
-                    filters={"team_id": team.get("team_id")})
-
+                players = team.get("athlete_teams") or [{}]
                 teams.append({
                     "team_id": team.get("team_id"),
                     "team_name": team.get("team_name"),
                     "sport": team.get("sport"),
-                    "players": len(players.data)
+                    "players": players[0].get("count", 0)
                 })
             logger.info(f"Fetched teams for coach {g.user_id} successfully.")
             return jsonify(teams=teams), 200
@@ -135,23 +136,27 @@ def fetch_athletes(team_id):
     """
 
     try:
-        athlete_ids = db_service.fetch(
+        # Resolve each athlete's status and name alongside team membership
+        athlete_teams = db_service.fetch(
             table="athlete_teams",
-            filters={"team_id": team_id}
+            filters={"team_id": team_id},
+            select="athlete_id, athletes(id, status, report_due, users(name))"
         )
 
-        if athlete_ids:
+        if athlete_teams:
             athletes = []
             healthy_athletes = 0
             at_risk_athletes = 0
             injured_athletes = 0
             reports_due = 0
 
-            for athlete_id in athlete_ids.data:
-                athlete = db_service.fetch(
-                    table="athletes",
-                    filters={"id": athlete_id.get("athlete_id")}
-                ).data[0]
+            for athlete_team in athlete_teams.data:
+                athlete = athlete_team.get("athletes")
+                if not athlete:
+                    logger.warning(
+                        f"No athlete record for {athlete_team.get('athlete_id')}")
+                    continue
+
                 if athlete.get("status") == HealthStatus.GREEN:
                     healthy_athletes += 1
                 elif athlete.get("status") == HealthStatus.AMBER:
@@ -164,7 +169,7 @@ def fetch_athletes(team_id):
 
                 athletes.append({
                     "athlete_id": athlete.get("id"),
-                    "name": db_service.fetch("users", filters={"id": athlete.get("id")}).data[0].get("name"),
+                    "name": (athlete.get("users") or {}).get("name"),
                     "health_status": athlete.get("status"),
                     "report_due": athlete.get("report_due")
                 })
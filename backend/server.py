@@ -1,7 +1,12 @@
 from flask import Flask, request
 from flask_cors import CORS
 from auth_middleware import check_auth
-from services.scheduler_service import SchedulerService
+from services.query_metrics import init_query_metrics
+from services.background_queue import background_queue
+from services.notification_outbox import notification_outbox
+from services.push_receipt_service import push_receipt_service
+from services.scheduler_service import scheduler_service
+from services.report_rollup import init_rollup_cli
 import logging
 import atexit
 
@@ -22,8 +27,6 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-scheduler_service = SchedulerService()
-
 app = Flask(__name__)
 
 CORS(
@@ -34,6 +37,12 @@ CORS(
     supports_credentials=True
 )
 
+# Per-request query counts and database time
+init_query_metrics(app)
+
+# `flask rollup rebuild` backfills the daily report rollup
+init_rollup_cli(app)
+
 
 @app.before_request
 def authenticate():
@@ -44,14 +53,19 @@ def authenticate():
         '/api/auth/refresh_token',
         '/api/auth/send_otp',
         '/api/auth/verify_otp',
-        # This endpoint is protected by a separate secret token, not user auth
-        '/api/admin/trigger_reminders'
+        # These endpoints are protected by a separate secret token, not user auth
+        '/api/admin/trigger_reminders',
+        '/api/admin/rebuild_rollup'
     ]
 
     # Skip auth check for public routes
     if request.path in public_routes:
         return
 
+    # Background job status is protected by the scheduler secret as well
+    if request.path.startswith('/api/admin/jobs/'):
+        return
+
     # For all other routes, require authentication
     if request.path.startswith('/api'):
         return check_auth()
@@ -67,6 +81,11 @@ app.register_blueprint(notifications_bp, url_prefix='/api/notifications')
 app.register_blueprint(admin_bp, url_prefix='/api/admin')
 app.register_blueprint(session_bp, url_prefix='/api/session')
 
+# Background workers, queue handlers are registered by the blueprints above
+background_queue.start()
+notification_outbox.start()
+push_receipt_service.start()
+
 if __name__ == '__main__':
     scheduler_service.start()
     # Gracefully shutdown scheduler when process stops
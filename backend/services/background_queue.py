@@ -0,0 +1,170 @@
+from typing import Callable, Dict
+import atexit
+import fcntl
+import json
+import queue
+import threading
+import time
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+BACKGROUND_QUEUE_SIZE = int(os.getenv("BACKGROUND_QUEUE_SIZE", 1000))
+
+# Jobs that do not fit in the queue, or are still queued at shutdown, are written here
+BACKGROUND_SPOOL_PATH = os.getenv(
+    "BACKGROUND_SPOOL_PATH", "background_spool.jsonl")
+
+
+class BackgroundQueue:
+    """
+    In-process queue that moves work that does not affect the response, such as
+    coach notification fan-out and report rollup updates, off the request path. Jobs are handled by a background
+    worker thread. When the queue is full, or the process shuts down with jobs still
+    queued, jobs are spooled to a local file and replayed once the worker is idle again.
+    """
+
+    def __init__(self, maxsize: int = BACKGROUND_QUEUE_SIZE, spool_path: str = BACKGROUND_SPOOL_PATH):
+        self.spool_path = spool_path
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._handlers: Dict[str, Callable[[dict], None]] = {}
+        self._lock = threading.Lock()
+        self._worker = None
+
+        self.processed = 0
+        self.failed = 0
+        self.spooled = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._total_lag = 0.0
+
+        atexit.register(self._spool_remaining)
+
+    def register(self, job_type: str, handler: Callable[[dict], None]):
+        """Register the function that handles jobs of the given type."""
+        self._handlers[job_type] = handler
+
+    def enqueue(self, job_type: str, payload: dict):
+        """
+        Queue a job for the background worker and return immediately.
+
+        Args:
+            job_type (str): Type of job, as registered with register().
+            payload (dict): JSON serialisable job arguments.
+        """
+        self.start()
+        job = {"type": job_type, "payload": payload, "enqueued_at": time.time()}
+
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            logger.warning(f"Background queue full, spooling {job_type} job")
+            self._spool([job])
+
+    def start(self):
+        """Start the worker thread, which also replays any jobs spooled by a previous run."""
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(
+                        target=self._run, name="background-queue", daemon=True)
+                    self._worker.start()
+
+    def _run(self):
+        while True:
+            try:
+                job = self._queue.get(timeout=5)
+            except queue.Empty:
+                self._replay_spool()
+                continue
+
+            self._handle(job)
+            self._queue.task_done()
+
+    def _handle(self, job: dict):
+        handler = self._handlers.get(job.get("type"))
+        if handler is None:
+            logger.error(f"No handler registered for job type {job.get('type')}")
+            with self._lock:
+                self.failed += 1
+            return
+
+        try:
+            handler(job.get("payload") or {})
+            lag = time.time() - job.get("enqueued_at", time.time())
+            with self._lock:
+                self.processed += 1
+                self.last_lag = lag
+                self.max_lag = max(self.max_lag, lag)
+                self._total_lag += lag
+        except Exception as e:
+            logger.error(f"Error handling {job.get('type')} job: {e}")
+            with self._lock:
+                self.failed += 1
+
+    def _spool(self, jobs: list):
+        try:
+            with open(self.spool_path, "a") as spool:
+                fcntl.flock(spool, fcntl.LOCK_EX)
+                for job in jobs:
+                    spool.write(json.dumps(job) + "\n")
+            with self._lock:
+                self.spooled += len(jobs)
+        except OSError as e:
+            logger.error(f"Error spooling {len(jobs)} background job(s): {e}")
+
+    def _replay_spool(self):
+        """Move spooled jobs back onto the queue while there is room."""
+        if not os.path.exists(self.spool_path):
+            return
+
+        try:
+            with open(self.spool_path, "r+") as spool:
+                fcntl.flock(spool, fcntl.LOCK_EX)
+                jobs = [json.loads(line) for line in spool if line.strip()]
+                spool.seek(0)
+                spool.truncate()
+
+                remaining = []
+                for job in jobs:
+                    try:
+                        self._queue.put_nowait(job)
+                    except queue.Full:
+                        remaining.append(job)
+
+                for job in remaining:
+                    spool.write(json.dumps(job) + "\n")
+
+            if jobs:
+                logger.info(
+                    f"Replayed {len(jobs) - len(remaining)} spooled background job(s)")
+        except (OSError, ValueError) as e:
+            logger.error(f"Error replaying background spool: {e}")
+
+    def _spool_remaining(self):
+        jobs = []
+        while True:
+            try:
+                jobs.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if jobs:
+            logger.info(f"Spooling {len(jobs)} queued background job(s) at shutdown")
+            self._spool(jobs)
+
+    def stats(self) -> dict:
+        """Queue depth and delivery lag, in seconds, between enqueue and handling."""
+        with self._lock:
+            return {
+                "depth": self._queue.qsize(),
+                "processed": self.processed,
+                "failed": self.failed,
+                "spooled": self.spooled,
+                "last_lag": round(self.last_lag, 3),
+                "max_lag": round(self.max_lag, 3),
+                "avg_lag": round(self._total_lag / self.processed, 3) if self.processed else 0.0
+            }
+
+
+background_queue = BackgroundQueue()
@@ -1,24 +1,73 @@
+from flask import g, has_request_context
 from services.supabase_service import SupabaseService
+from services.query_cache import QueryCache, get_query_cache
+from services.query_metrics import track_query
+from postgrest import APIResponse, CountMethod
+from typing import List
+import copy
+import json
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
+# UUIDs are ~40 characters once encoded, keeping in_ filters well under URL limits
+FETCH_MANY_CHUNK_SIZE = int(os.getenv("FETCH_MANY_CHUNK_SIZE", 100))
+
+# Larger results are rarely refetched and are too costly to copy into the request memo
+QUERY_MEMO_MAX_ROWS = int(os.getenv("QUERY_MEMO_MAX_ROWS", 200))
+
+# Primary key columns by table, read once per process from the PostgREST schema
+_primary_keys = {}
+
 
 class DatabaseService:
     """
-    Service to handle all database operations using Supabase.
+    Service to handle all database operations using Supabase. Fetches may be served
+    from the shared query cache, which is invalidated by writes made through this service.
+    Within a Flask request, identical fetches are only sent to the database once.
     """
 
-    def __init__(self):
+    def __init__(self, query_cache: QueryCache = None):
         self.supabase = SupabaseService().get_client()
-
-    def insert(self, table: str, data: dict) -> dict:
+        self._query_cache = query_cache
+
+    @property
+    def query_cache(self) -> QueryCache:
+        # Defaults to the shared cache so every route module sees the same entries
+        return self._query_cache or get_query_cache()
+
+    @staticmethod
+    def _memo():
+        """Identity map of fetch results for the current request, if any."""
+        if not has_request_context():
+            return None
+        if "query_memo" not in g:
+            g.query_memo = {}
+        return g.query_memo
+
+    def _invalidate(self, table: str):
+        """Drop cached and request-memoised results that read the written table."""
+        self.query_cache.invalidate(table)
+
+        memo = self._memo()
+        if memo:
+            for key in [key for key, (tables, _) in memo.items() if table in tables]:
+                del memo[key]
+
+    def _remember(self, memo: dict, key: str, table: str, select: str, data: list):
+        if memo is not None and len(data) <= QUERY_MEMO_MAX_ROWS:
+            tables = self.query_cache.referenced_tables(table, select)
+            memo[key] = (tables, copy.deepcopy(data))
+
+    def insert(self, table: str, data) -> dict:
         """
         Insert data into a specified table.
 
         Args:
             table (str): Name of the table to insert into
-            data (dict): Dictionary containing the data to insert
+            data (dict | list): Dictionary containing the data to insert,
+                or a list of dictionaries to insert several rows in one request
 
         Returns:
             Response from the database operation
@@ -27,8 +76,10 @@ class DatabaseService:
             Exception: If insert operation fails
         """
         try:
-            response = self.supabase.table(table).insert(data).execute()
-            logger.info(f"Data inserted into {table}: {response}")
+            with track_query("insert", table):
+                response = self.supabase.table(table).insert(data).execute()
+            self._invalidate(table)
+            logger.info(f"Data inserted into {table}: {len(response.data)} row(s)")
 
             return response
 
@@ -36,6 +87,44 @@ class DatabaseService:
             logger.error(f"Error inserting data into {table}: {e}")
             raise e
 
+    @staticmethod
+    def _apply_filter(query, key: str, value):
+        """
+        Apply a single filter to a query. Values prefixed with an operator
+        (e.g. "gte.2026-01-01") use that operator, anything else is an equality match.
+        """
+        # Check if value contains an operator prefix
+        if isinstance(value, str) and '.' in value:
+            operator_map = {
+                'gte': 'gte',  # greater than or equal
+                'lte': 'lte',  # less than or equal
+                'gt': 'gt',    # greater than
+                'lt': 'lt',    # less than
+                'neq': 'neq'   # not equal
+            }
+
+            parts = value.split('.', 1)
+            if len(parts) == 2 and parts[0] in operator_map:
+                # Get operators, values, and construct the query
+                operator = parts[0]
+                actual_value = parts[1]
+                method = getattr(query, operator, None)
+                if method and callable(method):
+                    return method(key, actual_value)
+
+        return query.eq(key, value)
+
+    def _apply_filters(self, query, filters: dict = None):
+        """Apply a dictionary of filters to a query."""
+        for key, value in (filters or {}).items():
+            # Multiple conditions on one column (e.g. a two-sided range)
+            if isinstance(value, list):
+                for condition in value:
+                    query = self._apply_filter(query, key, condition)
+            else:
+                query = self._apply_filter(query, key, value)
+        return query
+
     def fetch(self, table: str, filters: dict = None, modifiers: dict = None, select: str = "*") -> dict:
         """
         Fetch data from a specified table with optional filters.
@@ -44,6 +133,8 @@ class DatabaseService:
             table (str): Name of the table to fetch from
             filters (dict): Filters to apply (e.g., {"id": "123"} or {"date": "gte.2026-01-01"})
                 Supports operators: gte, lte, gt, lt, neq (e.g., "gte.value")
+                A list applies several conditions to one column
+                (e.g., {"date": ["gte.2026-01-01", "lte.2026-01-31"]})
                 (default None)
             modifiers (dict):
                 Additional modifiers for the query (e.g, order column with desc=True).
@@ -57,34 +148,23 @@ class DatabaseService:
             Exception: If fetch operation fails
         """
         try:
-            query = self.supabase.table(table).select(select)
+            # Same query already made during this request
+            memo = self._memo()
+            memo_key = json.dumps(
+                [table, select, filters, modifiers], sort_keys=True, default=str)
+            if memo is not None and memo_key in memo:
+                logger.info(f"Request memo hit for {table} with filters {filters}")
+                return APIResponse(data=copy.deepcopy(memo[memo_key][1]))
+
+            cache_key, cache_ttl, cached = self.query_cache.lookup(
+                table, select, filters, modifiers)
+            if cached is not None:
+                logger.info(f"Cached data fetched from {table} with filters {filters}")
+                self._remember(memo, memo_key, table, select, cached)
+                return APIResponse(data=cached)
 
-            if filters:
-                for key, value in filters.items():
-                    # Check if value contains an operator prefix
-                    if isinstance(value, str) and '.' in value:
-                        operator_map = {
-                            'gte': 'gte',  # greater than or equal
-                            'lte': 'lte',  # less than or equal
-                            'gt': 'gt',    # greater than
-                            'lt': 'lt',    # less than
-                            'neq': 'neq'   # not equal
-                        }
-
-                        parts = value.split('.', 1)
-                        if len(parts) == 2 and parts[0] in operator_map:
-                            # Get operators, values, and construct the query
-                            operator = parts[0]
-                            actual_value = parts[1]
-                            method = getattr(query, operator, None)
-                            if method and callable(method):
-                                query = method(key, actual_value)
-                            else:
-                                query = query.eq(key, value)
-                        else:
-                            query = query.eq(key, value)
-                    else:
-                        query = query.eq(key, value)
+            query = self.supabase.table(table).select(select)
+            query = self._apply_filters(query, filters)
 
             if modifiers:
                 for method_name, value in modifiers.items():
@@ -100,7 +180,10 @@ class DatabaseService:
                     else:
                         logger.warning(f"Method '{method_name}' not valid")
 
-            response = query.execute()
+            with track_query("fetch", table):
+                response = query.execute()
+            self.query_cache.store(cache_key, cache_ttl, response.data)
+            self._remember(memo, memo_key, table, select, response.data)
             logger.info(f"Data fetched from {table} with filters {filters}")
             return response
 
@@ -109,6 +192,126 @@ class DatabaseService:
                 f"Error fetching data from {table} with filters {filters}: {e}")
             raise e
 
+    def count(self, table: str, filters: dict = None, method: str = "exact") -> int:
+        """
+        Count rows in a specified table without downloading them. Uses a HEAD
+        request so PostgREST only returns the count in the Content-Range header.
+
+        Args:
+            table (str): Name of the table to count rows in
+            filters (dict): Filters to apply, as accepted by fetch (default None)
+            method (str): PostgREST count method, "exact", "planned" or "estimated".
+                Planned and estimated counts are cheaper on large tables. (default "exact")
+
+        Returns:
+            Number of matching rows
+
+        Raises:
+            Exception: If count operation fails
+        """
+        try:
+            query = self.supabase.table(table).select(
+                "*", count=CountMethod(method), head=True)
+            query = self._apply_filters(query, filters)
+
+            with track_query("count", table):
+                response = query.execute()
+            logger.info(f"Counted rows in {table} with filters {filters}")
+            return response.count or 0
+
+        except Exception as e:
+            logger.error(
+                f"Error counting rows in {table} with filters {filters}: {e}")
+            raise e
+
+    def fetch_many(self, table: str, column: str, ids: list, select: str = "*", filters: dict = None, modifiers: dict = None, chunk_size: int = FETCH_MANY_CHUNK_SIZE) -> dict:
+        """
+        Fetch all rows whose column matches any of the given IDs. Large ID lists
+        are split into URL-safe in_ batches and the results are merged.
+
+        Args:
+            table (str): Name of the table to fetch from
+            column (str): Column to match the IDs against
+            ids (list): IDs to fetch, duplicates and None values are ignored
+            select (str): Columns to be retrieved. (default "*")
+            filters (dict): Additional filters, as accepted by fetch (default None)
+            modifiers (dict): Additional modifiers, as accepted by fetch.
+                Ordering applies within each batch. (default None)
+            chunk_size (int): Maximum number of IDs per request
+
+        Returns:
+            Response containing the merged data from every batch
+
+        Raises:
+            Exception: If any fetch operation fails
+        """
+        unique_ids = list(dict.fromkeys(i for i in ids if i is not None))
+        data = []
+
+        for start in range(0, len(unique_ids), chunk_size):
+            chunk = unique_ids[start:start + chunk_size]
+            response = self.fetch(
+                table,
+                filters=filters,
+                modifiers={**(modifiers or {}), "in_": (column, chunk)},
+                select=select
+            )
+            data.extend(response.data)
+
+        return APIResponse(data=data)
+
+    @staticmethod
+    def embed(relation: str, *columns: str, alias: str = None, hint: str = None, inner: bool = False) -> str:
+        """
+        Build an embedded resource for a select string, allowing related rows to be
+        fetched in the same request. Embeds can be nested by passing one as a column.
+
+        Example:
+            embed("athletes", "status", embed("users", "name")) -> "athletes(status,users(name))"
+
+        Args:
+            relation (str): The related table to embed
+            *columns (str): Columns to retrieve from the related table (default "*")
+            alias (str): Key to return the embedded rows under (default None)
+            hint (str): Foreign key or column to disambiguate the relationship (default None)
+            inner (bool): Only return parent rows that have a related row (default False)
+
+        Returns:
+            The select string for the embedded resource
+        """
+        resource = relation
+        if hint:
+            resource += f"!{hint}"
+        if inner:
+            resource += "!inner"
+        if alias:
+            resource = f"{alias}:{resource}"
+        return f"{resource}({','.join(columns) or '*'})"
+
+    def primary_key(self, table: str) -> List[str]:
+        """
+        Primary key columns of a table, read from the OpenAPI description PostgREST
+        serves at its root, which marks key columns with <pk/>.
+
+        Args:
+            table (str): Name of the table
+
+        Returns:
+            The key's column names, or an empty list if the schema could not be read
+        """
+        if table not in _primary_keys:
+            try:
+                response = self.supabase.postgrest.session.get("/")
+                response.raise_for_status()
+                columns = response.json()["definitions"][table]["properties"]
+            except Exception as e:
+                logger.error(f"Error reading the primary key of {table}: {e}")
+                return []
+            _primary_keys[table] = [
+                name for name, column in columns.items()
+                if "<pk/>" in (column.get("description") or "")]
+        return _primary_keys[table]
+
     def update(self, table: str, data: dict, filters: dict) -> dict:
         """
         Update data in a specified table.
@@ -130,7 +333,9 @@ class DatabaseService:
             for key, value in filters.items():
                 query = query.eq(key, value)
 
-            response = query.execute()
+            with track_query("update", table):
+                response = query.execute()
+            self._invalidate(table)
             logger.info(f"Data updated in {table}: {response}")
 
             return response
@@ -159,7 +364,9 @@ class DatabaseService:
             for key, value in filters.items():
                 query = query.eq(key, value)
 
-            response = query.execute()
+            with track_query("delete", table):
+                response = query.execute()
+            self._invalidate(table)
             logger.info(f"Data deleted from {table}: {response}")
             return response
         except Exception as e:
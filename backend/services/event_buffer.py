@@ -0,0 +1,307 @@
+from services.database_service import DatabaseService
+from collections import deque
+from postgrest import APIError
+from typing import Dict, List, Tuple
+import atexit
+import fcntl
+import json
+import threading
+import time
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Rows held in memory before the overflow policy applies
+EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", 10000))
+
+# Rows per bulk insert; a full batch is flushed straight away
+EVENT_FLUSH_SIZE = int(os.getenv("EVENT_FLUSH_SIZE", 200))
+
+# Maximum seconds a row waits in the buffer before being flushed
+EVENT_FLUSH_INTERVAL = float(os.getenv("EVENT_FLUSH_INTERVAL", 2))
+
+# What happens when the buffer is full: "block" waits up to EVENT_BLOCK_TIMEOUT
+# for room, "drop_oldest" discards the oldest row and "spill" writes to EVENT_SPILL_PATH
+EVENT_OVERFLOW_POLICY = os.getenv("EVENT_OVERFLOW_POLICY", "spill")
+EVENT_BLOCK_TIMEOUT = float(os.getenv("EVENT_BLOCK_TIMEOUT", 1))
+EVENT_SPILL_PATH = os.getenv("EVENT_SPILL_PATH", "session_events_spill.jsonl")
+
+OVERFLOW_POLICIES = {"block", "drop_oldest", "spill"}
+
+# Longest wait, in seconds, between flushes while the database is failing; the wait
+# doubles from EVENT_FLUSH_INTERVAL with each failed flush
+EVENT_BACKOFF_CAP = float(os.getenv("EVENT_BACKOFF_CAP", 60))
+
+# Rows the database rejects are written here with the error, for inspection
+EVENT_DEAD_LETTER_PATH = os.getenv("EVENT_DEAD_LETTER_PATH", "session_events_dead.jsonl")
+
+# Postgres error classes the database rejects a row for (invalid data, constraint
+# violations, unknown columns) and PostgREST request errors; retrying will not help
+REJECTED_ERROR_CLASSES = ("22", "23", "42", "PGRST1", "PGRST2")
+
+
+def is_rejected(error: Exception) -> bool:
+    """Whether an insert failed because of the rows themselves, rather than transiently."""
+    return isinstance(error, APIError) and str(error.code or "").startswith(REJECTED_ERROR_CLASSES)
+
+
+class EventBuffer:
+    """
+    Write-behind buffer for rows that do not need to be stored before a response is
+    sent. Rows are appended in memory and a background thread writes them as bulk
+    inserts once EVENT_FLUSH_SIZE rows are waiting or EVENT_FLUSH_INTERVAL has passed.
+    Rows that fail to insert transiently stay buffered, and flushes back off
+    exponentially until the database recovers. A batch the database rejects is split
+    in half until the rejected rows are found, and only those rows are dead-lettered
+    so they cannot hold up the rest. When the process exits the buffer is flushed,
+    and any rows still buffered are spilled to be replayed by the next process.
+    """
+
+    def __init__(self, table: str, max_size: int = EVENT_BUFFER_SIZE, flush_size: int = EVENT_FLUSH_SIZE,
+                 flush_interval: float = EVENT_FLUSH_INTERVAL, overflow_policy: str = EVENT_OVERFLOW_POLICY,
+                 spill_path: str = EVENT_SPILL_PATH, dead_letter_path: str = EVENT_DEAD_LETTER_PATH):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(
+                f"Unknown overflow policy {overflow_policy}, expected one of {sorted(OVERFLOW_POLICIES)}")
+
+        self.table = table
+        self.max_size = max_size
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.spill_path = spill_path
+        self.dead_letter_path = dead_letter_path
+
+        self._rows = deque()
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._db_service = None
+        self._worker = None
+
+        # Consecutive failed flushes, and when the worker may flush again
+        self._failures = 0
+        self._retry_at = 0.0
+
+        self.flushed = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.dead_lettered = 0
+        self.failed_flushes = 0
+        self.last_flush_ms = 0.0
+
+        atexit.register(self.close)
+
+    @property
+    def db_service(self) -> DatabaseService:
+        if self._db_service is None:
+            self._db_service = DatabaseService()
+        return self._db_service
+
+    def append(self, row: dict):
+        """
+        Buffer a row for insertion, applying the overflow policy if the buffer is full.
+
+        Args:
+            row (dict): JSON serialisable row to insert.
+        """
+        self.start()
+        with self._condition:
+            # Spilling takes the spill file lock, so it happens after releasing the buffer
+            spill = len(self._rows) >= self.max_size and self.overflow_policy == "spill"
+            if not spill:
+                if len(self._rows) >= self.max_size:
+                    if self.overflow_policy == "drop_oldest":
+                        self._rows.popleft()
+                        self.dropped += 1
+                    elif not self._condition.wait_for(
+                            lambda: len(self._rows) < self.max_size, timeout=EVENT_BLOCK_TIMEOUT):
+                        logger.warning(f"{self.table} buffer full, dropping event")
+                        self.dropped += 1
+                        return
+
+                self._rows.append(row)
+                if len(self._rows) >= self.flush_size:
+                    self._condition.notify_all()
+
+        if spill:
+            self._spill([row])
+
+    def start(self):
+        """Start the background thread that flushes the buffer."""
+        if self._worker is None:
+            with self._condition:
+                if self._worker is None:
+                    self._worker = threading.Thread(
+                        target=self._run, name=f"{self.table}-buffer", daemon=True)
+                    self._worker.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: len(self._rows) >= self.flush_size, timeout=self.flush_interval)
+            if time.monotonic() < self._retry_at:
+                continue
+            try:
+                self.flush()
+                if not self._failures:
+                    self._replay_spill()
+            except Exception as e:
+                logger.error(f"Error flushing {self.table} buffer: {e}")
+
+    def _take(self) -> List[dict]:
+        with self._condition:
+            batch = [self._rows.popleft()
+                     for _ in range(min(self.flush_size, len(self._rows)))]
+            self._condition.notify_all()
+        return batch
+
+    def flush(self) -> int:
+        """
+        Insert every buffered row, in batches of flush_size.
+
+        Returns:
+            Number of rows inserted.
+        """
+        inserted = 0
+        with self._flush_lock:
+            while True:
+                batch = self._take()
+                if not batch:
+                    break
+
+                started = time.perf_counter()
+                batch_inserted, retry = self._insert(batch)
+                inserted += batch_inserted
+                self.flushed += batch_inserted
+                if retry:
+                    self.failed_flushes += 1
+                    self._failures += 1
+                    backoff = min(EVENT_BACKOFF_CAP, self.flush_interval * 2 ** self._failures)
+                    self._retry_at = time.monotonic() + backoff
+                    logger.warning(
+                        f"{self.table} flush failed {self._failures} time(s), retrying in {backoff:.0f}s")
+                    self._requeue(retry)
+                    break
+                self._failures = 0
+                self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+        return inserted
+
+    def _insert(self, batch: List[dict]) -> Tuple[int, List[dict]]:
+        """
+        Insert a batch, splitting it in half whenever the database rejects it so that
+        only the rows it rejects on their own are dead-lettered.
+
+        Returns:
+            Number of rows inserted, and the rows to retry after a transient failure.
+        """
+        try:
+            self.db_service.insert(self.table, batch)
+            return len(batch), []
+        except Exception as e:
+            if not is_rejected(e):
+                logger.error(f"Error flushing {len(batch)} {self.table} row(s): {e}")
+                return 0, batch
+            if len(batch) == 1:
+                self._dead_letter(batch, e)
+                return 0, []
+
+        middle = len(batch) // 2
+        first_inserted, retry = self._insert(batch[:middle])
+        if retry:
+            # The database is failing transiently, so the rest waits for the next flush
+            return first_inserted, retry + batch[middle:]
+        second_inserted, retry = self._insert(batch[middle:])
+        return first_inserted + second_inserted, retry
+
+    def _requeue(self, batch: List[dict]):
+        """Put a failed batch back at the front of the buffer, spilling what no longer fits."""
+        with self._condition:
+            room = max(self.max_size - len(self._rows), 0)
+            overflow = batch[room:]
+            self._rows.extendleft(reversed(batch[:room]))
+        if overflow:
+            self._spill(overflow)
+
+    def close(self):
+        """
+        Flush the buffer at shutdown, unless the database is failing, and spill any
+        rows that could not be inserted so they are replayed rather than lost.
+        """
+        if time.monotonic() >= self._retry_at:
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing {self.table} buffer at shutdown: {e}")
+
+        with self._condition:
+            rows = list(self._rows)
+            self._rows.clear()
+        if rows:
+            logger.info(f"Spilling {len(rows)} buffered {self.table} row(s) at shutdown")
+            self._spill(rows)
+
+    def _dead_letter(self, rows: List[dict], error):
+        logger.error(f"Dead-lettering {len(rows)} {self.table} row(s): {error}")
+        try:
+            with open(self.dead_letter_path, "a") as dead_letter:
+                fcntl.flock(dead_letter, fcntl.LOCK_EX)
+                for row in rows:
+                    dead_letter.write(json.dumps({"row": row, "error": str(error)}, default=str) + "\n")
+        except OSError as e:
+            logger.error(f"Error dead-lettering {len(rows)} {self.table} row(s), dropping them: {e}")
+            self.dropped += len(rows)
+            return
+        self.dead_lettered += len(rows)
+
+    def _spill(self, rows: List[dict]):
+        try:
+            with open(self.spill_path, "a") as spill:
+                fcntl.flock(spill, fcntl.LOCK_EX)
+                for row in rows:
+                    spill.write(json.dumps(row) + "\n")
+            self.spilled += len(rows)
+        except OSError as e:
+            logger.error(f"Error spilling {len(rows)} {self.table} row(s), dropping them: {e}")
+            self.dropped += len(rows)
+
+    def _replay_spill(self):
+        """Move spilled rows back into the buffer once it has room."""
+        if not os.path.exists(self.spill_path):
+            return
+
+        try:
+            with open(self.spill_path, "r+") as spill:
+                fcntl.flock(spill, fcntl.LOCK_EX)
+                with self._condition:
+                    room = self.max_size - len(self._rows)
+                    if room <= 0:
+                        return
+                    rows = [json.loads(line) for line in spill if line.strip()]
+                    self._rows.extend(rows[:room])
+
+                spill.seek(0)
+                spill.truncate()
+                for row in rows[room:]:
+                    spill.write(json.dumps(row) + "\n")
+
+            if rows:
+                logger.info(f"Replayed {min(room, len(rows))} spilled {self.table} row(s)")
+        except (OSError, ValueError) as e:
+            logger.error(f"Error replaying {self.table} spill file: {e}")
+
+    def stats(self) -> Dict:
+        with self._condition:
+            return {
+                "buffered": len(self._rows),
+                "flushed": self.flushed,
+                "dropped": self.dropped,
+                "spilled": self.spilled,
+                "dead_lettered": self.dead_lettered,
+                "failed_flushes": self.failed_flushes,
+                "last_flush_ms": self.last_flush_ms
+            }
+
+
+session_event_buffer = EventBuffer("session_events")
@@ -0,0 +1,200 @@
+from services.job_service import JOB_STORE_PATH
+from services import sqlite_store
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, Optional
+import sqlite3
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Seconds last-run records are kept after their run
+JOB_RUN_RETENTION = 7 * 24 * 60 * 60
+
+
+class JobLockStore(ABC):
+    """
+    Storage for job leases and last-run records. Implement this interface to hold
+    leases in a database row (or advisory lock) shared by every instance instead of
+    a local SQLite file.
+    """
+
+    @abstractmethod
+    def acquire(self, name: str, owner: str, lease: float, window: float) -> bool:
+        ...
+
+    @abstractmethod
+    def renew(self, name: str, owner: str, lease: float) -> bool:
+        ...
+
+    @abstractmethod
+    def release(self, name: str, owner: str, status: str):
+        ...
+
+    @abstractmethod
+    def get(self, name: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def latest(self, prefix: str) -> Optional[Dict]:
+        ...
+
+
+class SQLiteJobLockStore(JobLockStore):
+    """Leases kept in a local SQLite file, shared by every gunicorn worker on the host."""
+
+    def __init__(self, path: str = JOB_STORE_PATH):
+        self.path = path
+
+    @staticmethod
+    def _create_tables(conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS job_runs (
+                name TEXT PRIMARY KEY,
+                lease_owner TEXT,
+                lease_until REAL,
+                last_run_at REAL,
+                last_status TEXT
+            )
+        """)
+
+    def _connect(self):
+        return sqlite_store.connect(self.path, self._create_tables)
+
+    def acquire(self, name: str, owner: str, lease: float, window: float) -> bool:
+        """Take the lease unless it is held, or the job succeeded within the window."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT * FROM job_runs WHERE name = ?", (name,)).fetchone()
+
+                if row and row["lease_until"] and row["lease_until"] > now:
+                    conn.execute("ROLLBACK")
+                    return False
+                if (row and row["last_status"] == "succeeded"
+                        and row["last_run_at"] and now - row["last_run_at"] < window):
+                    conn.execute("ROLLBACK")
+                    return False
+
+                conn.execute(
+                    "DELETE FROM job_runs WHERE lease_until IS NULL AND last_run_at < ?",
+                    (now - JOB_RUN_RETENTION,))
+                conn.execute(
+                    """INSERT INTO job_runs (name, lease_owner, lease_until) VALUES (?, ?, ?)
+                       ON CONFLICT (name) DO UPDATE
+                       SET lease_owner = excluded.lease_owner, lease_until = excluded.lease_until""",
+                    (name, owner, now + lease))
+                conn.execute("COMMIT")
+                return True
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def renew(self, name: str, owner: str, lease: float) -> bool:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE job_runs SET lease_until = ? WHERE name = ? AND lease_owner = ?",
+                (time.time() + lease, name, owner))
+            return cursor.rowcount == 1
+
+    def release(self, name: str, owner: str, status: str):
+        with self._connect() as conn:
+            conn.execute(
+                """UPDATE job_runs
+                   SET lease_owner = NULL, lease_until = NULL, last_run_at = ?, last_status = ?
+                   WHERE name = ? AND lease_owner = ?""",
+                (time.time(), status, name, owner))
+
+    def get(self, name: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM job_runs WHERE name = ?", (name,)).fetchone()
+        return dict(row) if row else None
+
+    def latest(self, prefix: str) -> Optional[Dict]:
+        """The most recently finished run of any job whose name starts with prefix."""
+        with self._connect() as conn:
+            row = conn.execute(
+                """SELECT * FROM job_runs WHERE substr(name, 1, ?) = ? AND last_run_at IS NOT NULL
+                   ORDER BY last_run_at DESC LIMIT 1""",
+                (len(prefix), prefix)).fetchone()
+        return dict(row) if row else None
+
+
+class JobLease:
+    """A held lease on a job run, which can be extended while the job makes progress."""
+
+    def __init__(self, lock: "JobLock", name: str, owner: str, lease: float):
+        self.lock = lock
+        self.name = name
+        self.owner = owner
+        self.lease = lease
+
+    def renew(self) -> bool:
+        """Extend the lease, returning False if it has lapsed and been taken over."""
+        renewed = self.lock.store.renew(self.name, self.owner, self.lease)
+        if not renewed:
+            logger.warning(f"Lost lease on {self.name} job")
+        return renewed
+
+
+class JobLock:
+    """
+    Ensures only one process runs a given job at a time, however many gunicorn
+    workers, schedulers or external triggers start it. A run holds a lease that
+    expires if its process dies, and a successful run is recorded so that
+    duplicate triggers within the window are no-ops.
+    """
+
+    def __init__(self, store: JobLockStore = None):
+        self._store = store
+
+    @property
+    def store(self) -> JobLockStore:
+        # Created on first use so importing the module never touches the filesystem
+        if self._store is None:
+            self._store = SQLiteJobLockStore()
+        return self._store
+
+    @contextmanager
+    def hold(self, name: str, lease: float, window: float = 0):
+        """
+        Hold the lease on a job for the duration of a with block.
+
+        Args:
+            name (str): Name of the job run, e.g. "daily_report_reminders".
+            lease (float): Seconds the lease lasts without being renewed.
+            window (float): Seconds after a successful run during which the job
+                will not run again. (default 0)
+
+        Yields:
+            A JobLease, or None if another process holds the lease or the job
+            already ran within the window.
+        """
+        owner = str(uuid.uuid4())
+        if not self.store.acquire(name, owner, lease, window):
+            logger.info(f"Skipping {name} job, already running or ran recently")
+            yield None
+            return
+
+        status = "failed"
+        try:
+            yield JobLease(self, name, owner, lease)
+            status = "succeeded"
+        finally:
+            self.store.release(name, owner, status)
+
+    def last_run(self, name: str) -> Optional[Dict]:
+        """The last-run record for a job, if it has ever run."""
+        return self.store.get(name)
+
+    def latest_run(self, prefix: str) -> Optional[Dict]:
+        """The most recent last-run record among jobs whose names start with prefix."""
+        return self.store.latest(prefix)
+
+
+job_lock = JobLock()
@@ -0,0 +1,146 @@
+from services import sqlite_store
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+import json
+import sqlite3
+import time
+import uuid
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Job records live in a file so any gunicorn worker can report on a job
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+
+# Finished jobs are kept this long, in seconds, for status requests
+JOB_RETENTION = int(os.getenv("JOB_RETENTION", 7 * 24 * 60 * 60))
+
+
+class JobService:
+    """
+    Runs long admin tasks in background threads so the triggering request returns
+    immediately. Each job's status, progress counts and duration are recorded and
+    can be looked up by job ID. A queued or running job whose process has exited,
+    e.g. a gunicorn worker that was killed, is reported as failed.
+    """
+
+    def __init__(self, path: str = JOB_STORE_PATH, max_workers: int = JOB_WORKERS):
+        self.path = path
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="job")
+
+    @staticmethod
+    def _create_tables(conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                status TEXT NOT NULL,
+                progress TEXT NOT NULL DEFAULT '{}',
+                error TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                pid INTEGER
+            )
+        """)
+        # Job stores created before jobs recorded their process
+        columns = [row["name"] for row in conn.execute("PRAGMA table_info(jobs)")]
+        if "pid" not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN pid INTEGER")
+
+    def _connect(self):
+        return sqlite_store.connect(self.path, self._create_tables)
+
+    def submit(self, name: str, func: Callable[[Callable[..., None]], Optional[Dict]]) -> str:
+        """
+        Queue a job to run in the background.
+
+        Args:
+            name (str): Name of the job, e.g. "daily_reminders".
+            func (callable): The job. It is passed a progress(**counts) callback
+                and may return a dictionary of final counts.
+
+        Returns:
+            The ID of the queued job.
+        """
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM jobs WHERE finished_at < ?", (now - JOB_RETENTION,))
+            conn.execute(
+                "INSERT INTO jobs (id, name, status, created_at, pid) VALUES (?, ?, 'queued', ?, ?)",
+                (job_id, name, now, os.getpid()))
+
+        self._executor.submit(self._run, job_id, name, func)
+        logger.info(f"Queued {name} job {job_id}")
+        return job_id
+
+    def _update(self, job_id: str, **fields):
+        if "progress" in fields:
+            fields["progress"] = json.dumps(fields["progress"])
+        columns = ", ".join(f"{column} = ?" for column in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?",
+                         (*fields.values(), job_id))
+
+    def _run(self, job_id: str, name: str, func: Callable):
+        self._update(job_id, status="running", started_at=time.time())
+
+        def progress(**counts):
+            self._update(job_id, progress=counts)
+
+        try:
+            result = func(progress)
+            fields = {"status": "succeeded", "finished_at": time.time()}
+            if result is not None:
+                fields["progress"] = result
+            self._update(job_id, **fields)
+            logger.info(f"{name} job {job_id} succeeded")
+        except Exception as e:
+            logger.error(f"{name} job {job_id} failed: {e}")
+            self._update(job_id, status="failed", error=str(e), finished_at=time.time())
+
+    @staticmethod
+    def _process_alive(pid: Optional[int]) -> bool:
+        """Whether the process running a job still exists. Jobs share a host with their store."""
+        if pid is None:
+            return True
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """
+        Look up a job.
+
+        Returns:
+            The job's status, progress counts and duration in seconds, or None if
+            there is no job with this ID.
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+
+        job = dict(row)
+        pid = job.pop("pid")
+        if job["status"] in ("queued", "running") and not self._process_alive(pid):
+            logger.warning(f"{job['name']} job {job_id} was {job['status']} in a process that has exited")
+            job.update(status="failed", error="Job process exited", finished_at=time.time())
+            self._update(job_id, status="failed", error=job["error"], finished_at=job["finished_at"])
+        job["progress"] = json.loads(job["progress"])
+        if job["started_at"]:
+            job["duration"] = round((job["finished_at"] or time.time()) - job["started_at"], 3)
+        else:
+            job["duration"] = None
+        return job
+
+
+job_service = JobService()
@@ -0,0 +1,312 @@
+from services.notification_service import NotificationService
+from services.push_receipt_service import push_receipt_service
+from services import sqlite_store
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+import json
+import random
+import sqlite3
+import threading
+import time
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_OUTBOX_PATH = os.getenv(
+    "NOTIFICATION_OUTBOX_PATH", "notification_outbox.db")
+
+# Attempts before a notification is moved to the dead-letter state
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 6))
+
+# Backoff between attempts, in seconds: random(0, min(cap, base * 2 ** attempts))
+OUTBOX_BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", 5))
+OUTBOX_BACKOFF_CAP = float(os.getenv("OUTBOX_BACKOFF_CAP", 900))
+
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", 2))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 500))
+
+# Seconds a claimed notification is reserved for one worker before it can be reclaimed
+OUTBOX_LEASE = 120
+
+# Sent and dead-lettered notifications are kept this long, in seconds, then purged
+OUTBOX_RETENTION = int(os.getenv("OUTBOX_RETENTION", 7 * 24 * 60 * 60))
+OUTBOX_PURGE_INTERVAL = 60 * 60
+
+# Expo errors that will never succeed on retry
+PERMANENT_ERRORS = {"DeviceNotRegistered", "InvalidCredentials",
+                    "MessageTooBig", "InvalidPushToken"}
+
+
+class OutboxStore(ABC):
+    """
+    Storage for pending notifications. Implement this interface to keep the outbox
+    in a database table shared by every instance instead of a local SQLite file.
+    """
+
+    @abstractmethod
+    def add(self, idempotency_key: str, message: Dict) -> bool:
+        ...
+
+    @abstractmethod
+    def claim_due(self, limit: int) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    def mark_sent(self, entry_id: int, ticket_id: Optional[str]):
+        ...
+
+    @abstractmethod
+    def mark_failed(self, entry_id: int, error: str, next_attempt_at: Optional[float]):
+        ...
+
+    @abstractmethod
+    def purge(self, before: float) -> int:
+        ...
+
+    @abstractmethod
+    def stats(self) -> Dict:
+        ...
+
+
+class SQLiteOutboxStore(OutboxStore):
+    """Outbox kept in a local SQLite file, safe to share between gunicorn workers."""
+
+    def __init__(self, path: str = NOTIFICATION_OUTBOX_PATH):
+        self.path = path
+
+    @staticmethod
+    def _create_tables(conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS notification_outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                idempotency_key TEXT NOT NULL UNIQUE,
+                message TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                lease_until REAL,
+                ticket_id TEXT,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_outbox_due
+            ON notification_outbox (status, next_attempt_at)
+        """)
+
+    def _connect(self):
+        return sqlite_store.connect(self.path, self._create_tables)
+
+    def add(self, idempotency_key: str, message: Dict) -> bool:
+        """Store a notification, returning False if the key has been seen before."""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                """INSERT OR IGNORE INTO notification_outbox
+                   (idempotency_key, message, next_attempt_at, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?)""",
+                (idempotency_key, json.dumps(message), now, now, now))
+            return cursor.rowcount == 1
+
+    def claim_due(self, limit: int) -> List[Dict]:
+        """Reserve due notifications, including any whose previous claim has lapsed."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    """SELECT * FROM notification_outbox
+                       WHERE (status = 'pending' AND next_attempt_at <= ?)
+                          OR (status = 'sending' AND lease_until < ?)
+                       ORDER BY next_attempt_at LIMIT ?""",
+                    (now, now, limit)).fetchall()
+
+                conn.executemany(
+                    """UPDATE notification_outbox
+                       SET status = 'sending', lease_until = ?, attempts = attempts + 1, updated_at = ?
+                       WHERE id = ?""",
+                    [(now + OUTBOX_LEASE, now, row["id"]) for row in rows])
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        return [{**dict(row), "attempts": row["attempts"] + 1, "message": json.loads(row["message"])}
+                for row in rows]
+
+    def mark_sent(self, entry_id: int, ticket_id: Optional[str]):
+        with self._connect() as conn:
+            conn.execute(
+                """UPDATE notification_outbox
+                   SET status = 'sent', ticket_id = ?, lease_until = NULL, updated_at = ?
+                   WHERE id = ?""",
+                (ticket_id, time.time(), entry_id))
+
+    def mark_failed(self, entry_id: int, error: str, next_attempt_at: Optional[float]):
+        """Schedule a retry, or dead-letter the notification when next_attempt_at is None."""
+        status = "pending" if next_attempt_at is not None else "dead"
+        with self._connect() as conn:
+            conn.execute(
+                """UPDATE notification_outbox
+                   SET status = ?, last_error = ?, next_attempt_at = COALESCE(?, next_attempt_at),
+                       lease_until = NULL, updated_at = ?
+                   WHERE id = ?""",
+                (status, error, next_attempt_at, time.time(), entry_id))
+
+    def purge(self, before: float) -> int:
+        """Delete sent and dead-lettered notifications last updated before the given time."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                """DELETE FROM notification_outbox
+                   WHERE status IN ('sent', 'dead') AND updated_at < ?""",
+                (before,))
+            return cursor.rowcount
+
+    def stats(self) -> Dict:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) AS count FROM notification_outbox GROUP BY status").fetchall()
+            oldest = conn.execute(
+                "SELECT MIN(created_at) FROM notification_outbox WHERE status IN ('pending', 'sending')").fetchone()[0]
+
+        counts = {"pending": 0, "sending": 0, "sent": 0, "dead": 0}
+        counts.update({row["status"]: row["count"] for row in rows})
+        counts["oldest_pending_age"] = round(time.time() - oldest, 3) if oldest else 0.0
+        return counts
+
+
+class NotificationOutbox:
+    """
+    Durable outbox for push notifications. Notifications are recorded before they
+    are sent and a background worker drains them, retrying failures with exponential
+    backoff and jitter. A notification that keeps failing is dead-lettered after
+    OUTBOX_MAX_ATTEMPTS. Idempotency keys ensure a notification is only recorded,
+    and so only delivered, once. Sent and dead-lettered notifications are purged
+    after OUTBOX_RETENTION.
+    """
+
+    def __init__(self, store: OutboxStore = None):
+        self._store = store
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._worker = None
+        self._last_purge = 0.0
+
+    @property
+    def store(self) -> OutboxStore:
+        # Created on first use so importing the module never touches the filesystem
+        if self._store is None:
+            with self._lock:
+                if self._store is None:
+                    self._store = SQLiteOutboxStore()
+        return self._store
+
+    def enqueue(self, idempotency_key: str, push_token: str, title: str, body: str, data: Optional[Dict] = None) -> bool:
+        """
+        Record a notification for delivery.
+
+        Args:
+            idempotency_key (str): Unique key for this notification. Re-enqueuing
+                the same key is a no-op.
+            push_token (str): The expo push token to send to.
+            title (str): Notification title.
+            body (str): Notification body.
+            data (dict): Optional custom data/metadata.
+
+        Returns:
+            True if the notification was recorded, False if it was a duplicate.
+        """
+        message = NotificationService.build_message(push_token, title, body, data)
+        added = self.store.add(idempotency_key, message)
+        if added:
+            self._wake.set()
+        else:
+            logger.info(f"Skipping duplicate notification {idempotency_key}")
+        return added
+
+    def start(self):
+        """Start the worker thread that drains the outbox."""
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(
+                        target=self._run, name="notification-outbox", daemon=True)
+                    self._worker.start()
+
+    def _run(self):
+        while True:
+            try:
+                if self.drain():
+                    continue
+                if time.time() - self._last_purge >= OUTBOX_PURGE_INTERVAL:
+                    self.purge()
+            except Exception as e:
+                logger.error(f"Error draining notification outbox: {e}")
+
+            self._wake.wait(timeout=OUTBOX_POLL_INTERVAL)
+            self._wake.clear()
+
+    @staticmethod
+    def _backoff(attempts: int) -> float:
+        # Full jitter spreads retries out so a recovered Expo is not hit all at once
+        return random.uniform(0, min(OUTBOX_BACKOFF_CAP, OUTBOX_BACKOFF_BASE * 2 ** attempts))
+
+    def drain(self) -> int:
+        """
+        Send one batch of due notifications.
+
+        Returns:
+            Number of notifications attempted.
+        """
+        entries = self.store.claim_due(OUTBOX_BATCH_SIZE)
+        if not entries:
+            return 0
+
+        tickets = NotificationService.send_messages(
+            [entry["message"] for entry in entries])
+        push_receipt_service.record(tickets)
+
+        sent = dead = 0
+        for entry, ticket in zip(entries, tickets):
+            if ticket.get("status") == "ok":
+                self.store.mark_sent(entry["id"], ticket.get("id"))
+                sent += 1
+                continue
+
+            error = (ticket.get("details") or {}).get("error") or ticket.get("message")
+            if error in PERMANENT_ERRORS or entry["attempts"] >= OUTBOX_MAX_ATTEMPTS:
+                self.store.mark_failed(entry["id"], error, None)
+                dead += 1
+                logger.warning(
+                    f"Notification {entry['idempotency_key']} dead-lettered after {entry['attempts']} attempt(s): {error}")
+            else:
+                self.store.mark_failed(
+                    entry["id"], error, time.time() + self._backoff(entry["attempts"]))
+
+        logger.info(
+            f"Outbox drained {len(entries)} notification(s): {sent} sent, {dead} dead-lettered")
+        return len(entries)
+
+    def purge(self) -> int:
+        """
+        Delete sent and dead-lettered notifications older than OUTBOX_RETENTION.
+        Their idempotency keys are forgotten too, which is safe as keys are only
+        reused by replays of recent jobs.
+
+        Returns:
+            Number of notifications deleted.
+        """
+        self._last_purge = time.time()
+        purged = self.store.purge(self._last_purge - OUTBOX_RETENTION)
+        if purged:
+            logger.info(f"Purged {purged} sent or dead-lettered notification(s) from the outbox")
+        return purged
+
+    def stats(self) -> Dict:
+        return self.store.stats()
+
+
+notification_outbox = NotificationOutbox()
@@ -1,11 +1,53 @@
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, wait
 import logging
+import os
+import time
 from typing import List, Dict, Optional
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
 EXPO_API_URL = "https://exp.host/--/api/v2/push/send"
+EXPO_RECEIPTS_URL = "https://exp.host/--/api/v2/push/getReceipts"
+
+# Expo accepts up to 100 messages per push request
+EXPO_BATCH_SIZE = 100
+
+# Expo accepts up to 1000 ticket IDs per receipts request
+EXPO_RECEIPTS_BATCH_SIZE = 1000
+
+# (connect, read) timeouts for Expo requests
+EXPO_TIMEOUT = (5, 30)
+
+# Number of batches sent to Expo at the same time
+NOTIFICATION_MAX_CONCURRENCY = int(os.getenv("NOTIFICATION_MAX_CONCURRENCY", 4))
+
+# Seconds a send_messages call may spend starting batches. Batches not started by
+# then are failed unsent, batches already sent to Expo are left to finish.
+NOTIFICATION_DEADLINE = float(os.getenv("NOTIFICATION_DEADLINE", 60))
+
+# Times a batch is resent after a timeout, connection error, 429 or 5xx
+NOTIFICATION_MAX_RETRIES = int(os.getenv("NOTIFICATION_MAX_RETRIES", 1))
+
+
+def _create_session() -> requests.Session:
+    """Keep-alive session so consecutive pushes reuse pooled connections to Expo."""
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(
+        pool_connections=1, pool_maxsize=max(10, NOTIFICATION_MAX_CONCURRENCY)))
+    session.headers.update({
+        "Accept": "application/json",
+        "Accept-Encoding": "gzip, deflate",
+        "Content-Type": "application/json"
+    })
+    return session
+
+
+_session = _create_session()
+_executor = ThreadPoolExecutor(
+    max_workers=NOTIFICATION_MAX_CONCURRENCY, thread_name_prefix="expo-push")
 
 
 class NotificationService:
@@ -15,6 +57,185 @@ class NotificationService:
     which subsequently sends the notification to a user's device.
     """
 
+    @staticmethod
+    def build_message(
+            push_token: str,
+            title: str,
+            body: str,
+            data: Optional[Dict] = None,
+            channel_id: str = "default"
+    ) -> Dict:
+        """Build the Expo push message for a single device."""
+        return {
+            "to": push_token,
+            "sound": "default",
+            "title": title,
+            "body": body,
+            "channelId": channel_id,
+            "data": data or {}
+        }
+
+    @staticmethod
+    def _post_chunk(messages: List[Dict]) -> tuple:
+        """
+        Send up to EXPO_BATCH_SIZE messages in one request.
+
+        Returns:
+            Tuple of (tickets, retryable). One push ticket per message, in the same
+            order as the messages, and whether a failed request is worth retrying.
+        """
+        try:
+            response = _session.post(
+                EXPO_API_URL, json=messages, timeout=EXPO_TIMEOUT)
+            response.raise_for_status()
+            tickets = response.json().get("data", [])
+
+            if len(tickets) != len(messages):
+                raise ValueError(
+                    f"Expected {len(messages)} tickets, received {len(tickets)}")
+            return tickets, False
+
+        except requests.exceptions.HTTPError as e:
+            logger.error(f"Failed to send notification batch: {e}")
+            status = e.response.status_code if e.response is not None else 0
+            retryable = status == 429 or status >= 500
+            return [{"status": "error", "message": str(e)} for _ in messages], retryable
+
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            logger.error(f"Failed to send notification batch: {e}")
+            return [{"status": "error", "message": str(e)} for _ in messages], True
+
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.error(f"Failed to send notification batch: {e}")
+            return [{"status": "error", "message": str(e)} for _ in messages], False
+
+    @staticmethod
+    def _unsent_tickets(messages: List[Dict], error: str) -> List[Dict]:
+        """Error tickets for messages that were never sent to Expo, so are safe to resend."""
+        return [{"push_token": message["to"], "status": "error", "message": error, "attempts": 0}
+                for message in messages]
+
+    @staticmethod
+    def _send_chunk(messages: List[Dict], deadline: float) -> List[Dict]:
+        """Send one batch, retrying transient failures while the deadline allows."""
+        if time.monotonic() >= deadline:
+            return NotificationService._unsent_tickets(messages, "Deadline exceeded")
+
+        attempts = 0
+        while True:
+            attempts += 1
+            tickets, retryable = NotificationService._post_chunk(messages)
+
+            if not retryable or attempts > NOTIFICATION_MAX_RETRIES or time.monotonic() >= deadline:
+                break
+
+            # Brief exponential backoff between attempts
+            time.sleep(min(0.5 * 2 ** (attempts - 1), max(0, deadline - time.monotonic())))
+
+        return [{"push_token": message["to"], "attempts": attempts, **ticket}
+                for message, ticket in zip(messages, tickets)]
+
+    @staticmethod
+    def send_messages(messages: List[Dict], deadline: float = NOTIFICATION_DEADLINE) -> List[Dict]:
+        """
+        Send push messages in batches of up to EXPO_BATCH_SIZE per request, with up to
+        NOTIFICATION_MAX_CONCURRENCY batches in flight at once.
+
+        Args:
+            messages (List[Dict]): Messages built with build_message.
+            deadline (float): Seconds allowed for starting batches. Batches not started
+                by then are reported as failed with attempts 0, as nothing was sent.
+                Batches already sent to Expo are waited for, each being bounded by
+                EXPO_TIMEOUT, so a message is never reported failed after delivery.
+
+        Returns:
+            One push ticket per message, in the same order as the messages. Each includes
+            the "push_token" it was sent to and the number of "attempts" made. Tickets
+            have a "status" of "ok" (with an "id" for receipt lookup) or "error".
+        """
+        deadline_at = time.monotonic() + deadline
+        tickets = [None] * len(messages)
+        valid = []
+
+        for index, message in enumerate(messages):
+            push_token = message.get("to")
+            # Validate token
+            if not push_token or not push_token.startswith("ExponentPushToken"):
+                logger.warning(f"Invalid token format: {push_token}")
+                tickets[index] = {
+                    "push_token": push_token,
+                    "status": "error",
+                    "message": "Invalid token format",
+                    "details": {"error": "InvalidPushToken"},
+                    "attempts": 0
+                }
+            else:
+                valid.append(index)
+
+        chunks = [valid[start:start + EXPO_BATCH_SIZE]
+                  for start in range(0, len(valid), EXPO_BATCH_SIZE)]
+
+        # A single batch gains nothing from the pool
+        if len(chunks) == 1:
+            results = [NotificationService._send_chunk(
+                [messages[index] for index in chunks[0]], deadline_at)]
+        else:
+            futures = [
+                _executor.submit(NotificationService._send_chunk,
+                                 [messages[index] for index in chunk], deadline_at)
+                for chunk in chunks
+            ]
+            wait(futures, timeout=max(0, deadline_at - time.monotonic()))
+
+            results = []
+            for future, chunk in zip(futures, chunks):
+                chunk_messages = [messages[index] for index in chunk]
+                # Only batches that have not started can be cancelled
+                if future.cancel():
+                    logger.error(
+                        f"Notification batch of {len(chunk)} was not sent before the deadline")
+                    results.append(NotificationService._unsent_tickets(
+                        chunk_messages, "Deadline exceeded"))
+                    continue
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    logger.error(f"Failed to send notification batch: {e}")
+                    results.append([{"push_token": message["to"], "status": "error",
+                                     "message": str(e), "attempts": 1}
+                                    for message in chunk_messages])
+
+        for chunk, chunk_tickets in zip(chunks, results):
+            for index, ticket in zip(chunk, chunk_tickets):
+                tickets[index] = ticket
+
+        return tickets
+
+    @staticmethod
+    def get_receipts(ticket_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Fetch push receipts for previously sent notifications, in batches of up to
+        EXPO_RECEIPTS_BATCH_SIZE ticket IDs per request.
+
+        Args:
+            ticket_ids (List[str]): IDs from "ok" push tickets.
+
+        Returns:
+            Dictionary mapping ticket ID to receipt. Receipts that are not ready yet,
+            or whose batch failed, are missing from the result.
+        """
+        receipts = {}
+        for start in range(0, len(ticket_ids), EXPO_RECEIPTS_BATCH_SIZE):
+            chunk = ticket_ids[start:start + EXPO_RECEIPTS_BATCH_SIZE]
+            try:
+                response = _session.post(
+                    EXPO_RECEIPTS_URL, json={"ids": chunk}, timeout=EXPO_TIMEOUT)
+                response.raise_for_status()
+                receipts.update(response.json().get("data", {}))
+            except (requests.exceptions.RequestException, ValueError) as e:
+                logger.error(f"Failed to fetch push receipts: {e}")
+        return receipts
+
     @staticmethod
     def send_notification(
             push_token: str,
@@ -36,33 +257,22 @@ class NotificationService:
         Returns:
             True if successful, False otherwise.
         """
-        # Validate token
-        if not push_token or not push_token.startswith("ExponentPushToken"):
-            logger.warning(f"Invalid token format: {push_token}")
-            return False
+        message = NotificationService.build_message(
+            push_token, title, body, data, channel_id)
+        ticket = NotificationService.send_messages([message])[0]
 
-        payload = {
-            "to": push_token,
-            "sound": "default",
-            "title": title,
-            "body": body,
-            "channelId": channel_id,
-            "data": data or {}
-        }
-
-        try:
-            response = requests.post(EXPO_API_URL, json=payload, timeout=30)
-            response.raise_for_status()
+        if ticket.get("status") == "ok":
             logger.info(f"Notification sent to {push_token[:20]}...")
             return True
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Fauled to send notification: {e}")
-            return False
+
+        logger.error(f"Failed to send notification: {ticket.get('message')}")
+        return False
 
     @staticmethod
-    def send_batch_notifications(push_tokens: List[str], title: str, body: str, data: Optional[Dict] = None) -> Dict[str, int]:
+    def send_batch_notifications(push_tokens: List[str], title: str, body: str, data: Optional[Dict] = None) -> Dict:
         """
-        Send mutliple notifications to multiple devices.
+        Send the same notification to multiple devices, packing up to
+        EXPO_BATCH_SIZE messages into each request and sending batches concurrently.
 
         Args:
             push_tokens (List [str]): The expo push tokens to send notifications to.
@@ -71,20 +281,25 @@ class NotificationService:
             data (dict): Optional data/metadata
 
         Returns: 
-            Dictionary with success/failure counts.
+            Dictionary with sent/failed/retried counts and the push ticket for each token.
 
         """
-        results = {"sent": 0, "failed": 0}
-        for token in push_tokens:
-            if NotificationService.send_notification(token, title, body, data):
+        messages = [NotificationService.build_message(token, title, body, data)
+                    for token in push_tokens]
+        tickets = NotificationService.send_messages(messages)
+
+        results = {"sent": 0, "failed": 0, "retried": 0, "tickets": tickets}
+        for ticket in tickets:
+            if ticket.get("status") == "ok":
                 results["sent"] += 1
             else:
                 results["failed"] += 1
+            if ticket.get("attempts", 0) > 1:
+                results["retried"] += 1
         return results
 
     @staticmethod
-    def send_daily_reminder(push_token: str) -> bool:
-        """Send a daily report submission reminder."""
+    def _daily_reminder_content() -> tuple:
         title = "Submission Due"
         body = (
             "Don't forget to submit your daily health report"
@@ -92,5 +307,16 @@ class NotificationService:
         data = {
             "timestamp": datetime.now().isoformat()
         }
+        return title, body, data
 
+    @staticmethod
+    def send_daily_reminder(push_token: str) -> bool:
+        """Send a daily report submission reminder."""
+        title, body, data = NotificationService._daily_reminder_content()
         return NotificationService.send_notification(push_token, title, body, data)
+
+    @staticmethod
+    def send_daily_reminders(push_tokens: List[str]) -> Dict:
+        """Send the daily report submission reminder to multiple devices."""
+        title, body, data = NotificationService._daily_reminder_content()
+        return NotificationService.send_batch_notifications(push_tokens, title, body, data)
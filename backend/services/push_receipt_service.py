@@ -0,0 +1,173 @@
+from services.database_service import DatabaseService
+from services.notification_service import NotificationService
+from services import sqlite_store
+from typing import Dict, List
+import sqlite3
+import threading
+import time
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Kept alongside the notification outbox by default
+PUSH_TICKETS_PATH = os.getenv("PUSH_TICKETS_PATH", "notification_outbox.db")
+
+# Expo recommends waiting before checking receipts, and keeps them for about a day
+RECEIPT_CHECK_DELAY = int(os.getenv("RECEIPT_CHECK_DELAY", 900))
+RECEIPT_RETENTION = 24 * 60 * 60
+RECEIPT_POLL_INTERVAL = int(os.getenv("RECEIPT_POLL_INTERVAL", 900))
+
+
+class PushReceiptService:
+    """
+    Tracks push tickets and polls Expo for their receipts. Devices that Expo reports
+    as DeviceNotRegistered (e.g. the app was uninstalled) have their push token
+    cleared from users, so future fan-outs only target live devices.
+    """
+
+    def __init__(self, path: str = PUSH_TICKETS_PATH):
+        self.path = path
+        self._db_service = None
+        self._lock = threading.Lock()
+        self._worker = None
+
+        self.tokens_pruned = 0
+        self.receipts_checked = 0
+        self.last_poll = None
+
+    @property
+    def db_service(self) -> DatabaseService:
+        if self._db_service is None:
+            self._db_service = DatabaseService()
+        return self._db_service
+
+    @staticmethod
+    def _create_tables(conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS push_tickets (
+                ticket_id TEXT PRIMARY KEY,
+                push_token TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+
+    def _connect(self):
+        return sqlite_store.connect(self.path, self._create_tables)
+
+    def record(self, tickets: List[Dict]):
+        """
+        Track the tickets from a send so their receipts can be checked later.
+        Tokens already rejected as DeviceNotRegistered at send time are pruned now.
+
+        Args:
+            tickets (List[Dict]): Tickets returned by NotificationService.send_messages.
+        """
+        now = time.time()
+        rows = [(ticket["id"], ticket["push_token"], now) for ticket in tickets
+                if ticket.get("status") == "ok" and ticket.get("id")]
+        dead_tokens = {ticket.get("push_token") for ticket in tickets
+                       if (ticket.get("details") or {}).get("error") == "DeviceNotRegistered"}
+
+        if rows:
+            try:
+                with self._connect() as conn:
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO push_tickets VALUES (?, ?, ?)", rows)
+            except sqlite3.Error as e:
+                logger.error(f"Error recording {len(rows)} push ticket(s): {e}")
+
+        if dead_tokens:
+            self.prune_tokens(dead_tokens)
+
+    def poll(self) -> Dict:
+        """
+        Check receipts for tickets old enough to have one, prune dead tokens and
+        stop tracking every ticket that was checked or has expired.
+
+        Returns:
+            Dictionary with the number of receipts checked and tokens pruned.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT ticket_id, push_token FROM push_tickets WHERE created_at <= ?",
+                (now - RECEIPT_CHECK_DELAY,)).fetchall()
+
+        tokens_by_ticket = dict(rows)
+        receipts = NotificationService.get_receipts(list(tokens_by_ticket))
+
+        dead_tokens = {
+            tokens_by_ticket[ticket_id] for ticket_id, receipt in receipts.items()
+            if ticket_id in tokens_by_ticket
+            and (receipt.get("details") or {}).get("error") == "DeviceNotRegistered"
+        }
+        pruned = self.prune_tokens(dead_tokens) if dead_tokens else 0
+
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM push_tickets WHERE ticket_id = ?",
+                             [(ticket_id,) for ticket_id in receipts])
+            conn.execute("DELETE FROM push_tickets WHERE created_at < ?",
+                         (now - RECEIPT_RETENTION,))
+
+        with self._lock:
+            self.receipts_checked += len(receipts)
+            self.last_poll = now
+
+        logger.info(
+            f"Checked {len(receipts)} push receipt(s), pruned {pruned} dead push token(s)")
+        return {"receipts_checked": len(receipts), "tokens_pruned": pruned}
+
+    def prune_tokens(self, push_tokens) -> int:
+        """
+        Clear push tokens that Expo reports as no longer registered.
+
+        Returns:
+            Number of users whose push token was cleared.
+        """
+        pruned = 0
+        for push_token in push_tokens:
+            try:
+                response = self.db_service.update(
+                    table="users",
+                    data={"push_token": None},
+                    filters={"push_token": push_token})
+                # Only rows that still held the token are cleared
+                pruned += len(response.data or [])
+            except Exception as e:
+                logger.error(f"Error pruning push token {push_token[:20]}...: {e}")
+
+        with self._lock:
+            self.tokens_pruned += pruned
+        return pruned
+
+    def start(self):
+        """Start the background thread that polls receipts every RECEIPT_POLL_INTERVAL."""
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(
+                        target=self._run, name="push-receipts", daemon=True)
+                    self._worker.start()
+
+    def _run(self):
+        while True:
+            time.sleep(RECEIPT_POLL_INTERVAL)
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Error polling push receipts: {e}")
+
+    def stats(self) -> Dict:
+        with self._connect() as conn:
+            tracked = conn.execute("SELECT COUNT(*) FROM push_tickets").fetchone()[0]
+        with self._lock:
+            return {
+                "tickets_tracked": tracked,
+                "receipts_checked": self.receipts_checked,
+                "tokens_pruned": self.tokens_pruned,
+                "last_poll": self.last_poll
+            }
+
+
+push_receipt_service = PushReceiptService()
@@ -0,0 +1,205 @@
+from abc import ABC, abstractmethod
+from cachetools import TLRUCache
+import copy
+import hashlib
+import json
+import re
+import threading
+import time
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE_ENABLED", "false").lower() == "true"
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", 2048))
+
+# Tables that change rarely but are re-read on most coach requests.
+# Override with QUERY_CACHE_TTLS, e.g. "teams=60,users=30"
+DEFAULT_TABLE_TTLS = {
+    "teams": 60,
+    "users": 30,
+    "coaches": 300,
+    "athlete_teams": 30
+}
+
+# Matches the relation of an embedded resource, e.g. "users" in "coach:users!coach_id(name)"
+EMBED_PATTERN = re.compile(r"(\w+)(?:!\w+)*\s*\(")
+
+
+def _parse_ttls(value: str) -> dict:
+    ttls = {}
+    for item in value.split(","):
+        if "=" in item:
+            table, ttl = item.split("=", 1)
+            ttls[table.strip()] = int(ttl)
+    return ttls
+
+
+class QueryCacheBackend(ABC):
+    """
+    Storage used by QueryCache. Implement this interface to share cached results
+    and table generations across gunicorn workers (e.g. with Redis or Memcached).
+    """
+
+    @abstractmethod
+    def get(self, key: str):
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value, ttl: int):
+        ...
+
+    @abstractmethod
+    def get_generation(self, table: str) -> int:
+        ...
+
+    @abstractmethod
+    def bump_generation(self, table: str):
+        ...
+
+    def __len__(self):
+        return 0
+
+
+class InMemoryQueryCacheBackend(QueryCacheBackend):
+    """Per-process LRU backend where each entry expires after its own TTL."""
+
+    def __init__(self, maxsize: int = QUERY_CACHE_SIZE):
+        self._cache = TLRUCache(
+            maxsize=maxsize, ttu=lambda key, value, now: now + value[0], timer=time.monotonic)
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._cache.get(key)
+            return entry[1] if entry else None
+
+    def set(self, key: str, value, ttl: int):
+        with self._lock:
+            self._cache[key] = (ttl, value)
+
+    def get_generation(self, table: str) -> int:
+        with self._lock:
+            return self._generations.get(table, 0)
+
+    def bump_generation(self, table: str):
+        with self._lock:
+            self._generations[table] = self._generations.get(table, 0) + 1
+
+    def __len__(self):
+        with self._lock:
+            return len(self._cache)
+
+
+class QueryCache:
+    """
+    Read-through cache for DatabaseService.fetch. Results are keyed by table, select,
+    filters and modifiers, and only cached when every table the query touches
+    (including embedded resources) has a configured TTL.
+
+    Writes bump the generation of the written table. Every key includes the
+    generations of the tables it reads, so a write makes older entries unreachable
+    without scanning the cache.
+    """
+
+    def __init__(self, backend: QueryCacheBackend = None, ttls: dict = None, enabled: bool = QUERY_CACHE_ENABLED):
+        self.backend = backend or InMemoryQueryCacheBackend()
+        self.ttls = ttls if ttls is not None else {
+            **DEFAULT_TABLE_TTLS, **_parse_ttls(os.getenv("QUERY_CACHE_TTLS", ""))}
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def referenced_tables(table: str, select: str) -> set:
+        """All tables read by a query, including embedded resources."""
+        return {table, *EMBED_PATTERN.findall(select or "")}
+
+    def _ttl(self, tables: set):
+        ttls = [self.ttls.get(table) for table in tables]
+        if not ttls or None in ttls:
+            return None
+        return min(ttls)
+
+    def _key(self, table: str, select: str, filters: dict, modifiers: dict, tables: set) -> str:
+        generations = {t: self.backend.get_generation(t) for t in sorted(tables)}
+        raw = json.dumps(
+            [table, select, filters or {}, modifiers or {}, generations],
+            sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def lookup(self, table: str, select: str, filters: dict, modifiers: dict):
+        """
+        Look up a cached result.
+
+        Returns:
+            Tuple of (key, ttl, data). Key is None when the query is not cacheable,
+            data is None on a cache miss.
+        """
+        if not self.enabled:
+            return None, None, None
+
+        tables = self.referenced_tables(table, select)
+        ttl = self._ttl(tables)
+        if ttl is None:
+            self._count("bypassed")
+            return None, None, None
+
+        key = self._key(table, select, filters, modifiers, tables)
+        data = self.backend.get(key)
+        if data is None:
+            self._count("misses")
+            return key, ttl, None
+
+        self._count("hits")
+        # Callers may mutate rows, never hand out the cached objects
+        return key, ttl, copy.deepcopy(data)
+
+    def store(self, key: str, ttl: int, data: list):
+        if key is not None:
+            self.backend.set(key, copy.deepcopy(data), ttl)
+
+    def invalidate(self, table: str):
+        """Invalidate every cached query that reads the given table."""
+        if not self.enabled or table not in self.ttls:
+            return
+        self.backend.bump_generation(table)
+        self._count("invalidations")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self.backend),
+                "ttls": self.ttls,
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+_query_cache = QueryCache()
+
+
+def get_query_cache() -> QueryCache:
+    """The process-wide query cache shared by every DatabaseService instance."""
+    return _query_cache
+
+
+def configure_query_cache(backend: QueryCacheBackend = None, ttls: dict = None, enabled: bool = True) -> QueryCache:
+    """Replace the process-wide query cache, e.g. with a backend shared across workers."""
+    global _query_cache
+    _query_cache = QueryCache(backend=backend, ttls=ttls, enabled=enabled)
+    return _query_cache
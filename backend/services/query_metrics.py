@@ -0,0 +1,91 @@
+from flask import g, request, has_request_context
+from contextlib import contextmanager
+from collections import Counter
+import json
+import time
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Maximum database queries per request, 0 disables the budget
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", 0))
+
+# Queries against one table within a request before it is flagged as a possible N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", 5))
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised in testing mode when a request makes more queries than its budget allows."""
+
+
+@contextmanager
+def track_query(operation: str, table: str):
+    """
+    Time a database round-trip and record it against the current request.
+
+    Args:
+        operation (str): The operation performed, e.g. "fetch" or "insert".
+        table (str): The table queried.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if has_request_context():
+            if "query_stats" not in g:
+                g.query_stats = {"count": 0, "duration": 0.0, "tables": Counter()}
+            stats = g.query_stats
+            stats["count"] += 1
+            stats["duration"] += time.perf_counter() - start
+            stats["tables"][f"{operation}:{table}"] += 1
+
+
+def init_query_metrics(app):
+    """
+    Register hooks that report each request's query count and database time as
+    Server-Timing headers and a structured log line, flagging repeated queries
+    against the same table. QUERY_BUDGET (or a per-endpoint QUERY_BUDGETS entry)
+    in the app config limits queries per request, raising QueryBudgetExceeded
+    when the app is in testing mode.
+    """
+    app.config.setdefault("QUERY_BUDGET", QUERY_BUDGET)
+    app.config.setdefault("QUERY_BUDGETS", {})
+
+    @app.after_request
+    def report_query_metrics(response):
+        stats = g.get("query_stats")
+        if not stats:
+            return response
+
+        duration_ms = round(stats["duration"] * 1000, 2)
+        response.headers.add(
+            "Server-Timing", f'db;dur={duration_ms};desc="{stats["count"]} queries"')
+        response.headers["X-DB-Query-Count"] = str(stats["count"])
+
+        repeated = {key: count for key, count in stats["tables"].items()
+                    if count >= N_PLUS_ONE_THRESHOLD}
+
+        logger.info(json.dumps({
+            "event": "request_queries",
+            "method": request.method,
+            "path": request.path,
+            "endpoint": request.endpoint,
+            "status": response.status_code,
+            "queries": stats["count"],
+            "db_ms": duration_ms,
+            "tables": dict(stats["tables"]),
+        }))
+        if repeated:
+            logger.warning(
+                f"Possible N+1 query pattern on {request.path}: {repeated}")
+
+        budget = app.config["QUERY_BUDGETS"].get(
+            request.endpoint, app.config["QUERY_BUDGET"])
+        if budget and stats["count"] > budget:
+            message = f"{request.endpoint} made {stats['count']} queries, budget is {budget}"
+            if app.testing:
+                raise QueryBudgetExceeded(message)
+            logger.warning(f"Query budget exceeded: {message}")
+
+        return response
@@ -0,0 +1,295 @@
+from services.database_service import DatabaseService
+from services.report_rollup import paging_order
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+import csv
+import importlib.util
+import io
+import json
+import re
+import zlib
+import os
+import zstandard
+
+# Rows fetched per page. Pages larger than the request memo limit are not copied into it.
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", 1000))
+
+# Columns derived from the athlete's user record rather than stored on the report
+DERIVED_COLUMNS = ("athlete_age", "gender")
+
+COLUMN_PATTERN = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+COMPRESSIONS = {
+    "gzip": ("application/gzip", ".gz"),
+    "zstd": ("application/zstd", ".zst"),
+}
+
+# Columnar formats, written with pyarrow
+COLUMNAR_FORMATS = {
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", ".arrows"),
+}
+COLUMNAR_COMPRESSION = os.getenv("COLUMNAR_COMPRESSION", "zstd")
+
+# Rows per Parquet row group or Arrow record batch, pages are combined up to this size
+EXPORT_ROW_GROUP_SIZE = int(os.getenv("EXPORT_ROW_GROUP_SIZE", 10000))
+
+# Low-cardinality text columns stored as dictionary indices in columnar exports
+DICTIONARY_COLUMNS = ("injury_code", "injury_side", "new_availability", "sport")
+
+# Types of the non-text columns of each report table in columnar exports. Every
+# other column is written as text, so the schema never depends on which values
+# happen to be in the first row group.
+COLUMNAR_TYPES = {
+    "reports": {"injured": "bool", "ill": "bool", "timeloss": "bool", "consulted": "bool", "rpe": "int64"},
+    "followup_reports": {"rpe": "int64"},
+}
+COMMON_COLUMNAR_TYPES = {"created_at": "timestamp", "athlete_age": "int64"}
+
+
+def parse_columns(columns: Optional[str]) -> Optional[List[str]]:
+    """
+    Parse a comma separated column list.
+
+    Raises:
+        ValueError: If a column name is not a plain identifier.
+    """
+    if not columns:
+        return None
+    names = [name.strip() for name in columns.split(",") if name.strip()]
+    for name in names:
+        if not COLUMN_PATTERN.match(name):
+            raise ValueError(f"Invalid column name {name}")
+    return names
+
+
+def iter_report_pages(db_service: DatabaseService, table: str, since: str = None, until: str = None,
+                      columns: List[str] = None, page_size: int = EXPORT_PAGE_SIZE) -> Iterator[List[Dict]]:
+    """
+    Yield pages of reports, oldest first, fetched with range requests so only one
+    page is held in memory at a time. Each report gains the athlete's age and gender.
+
+    Args:
+        db_service (DatabaseService): Service used to fetch the pages.
+        table (str): "reports" or "followup_reports".
+        since (str): Only include reports created on or after this date. (default None)
+        until (str): Only include reports created on or before this date, including
+            the whole day if no time is given. (default None)
+        columns (List[str]): Columns to include, all columns if None. (default None)
+        page_size (int): Rows per page.
+    """
+    stored = [column for column in columns if column not in DERIVED_COLUMNS] if columns else ["*"]
+    select = ",".join(stored + [db_service.embed("athletes", db_service.embed("users", "dob", "gender"))])
+
+    conditions = []
+    if since:
+        conditions.append(f"gte.{since}")
+    if until:
+        try:
+            # A date alone covers the whole of that day
+            conditions.append(f"lt.{date.fromisoformat(until) + timedelta(days=1)}")
+        except ValueError:
+            conditions.append(f"lte.{until}")
+    filters = {"created_at": conditions} if conditions else None
+
+    today = datetime.today()
+    ages = {}
+    order = paging_order(db_service, table)
+    offset = 0
+    while True:
+        response = db_service.fetch(
+            table,
+            filters=filters,
+            modifiers={
+                "order": order,
+                "range": (offset, offset + page_size - 1)
+            },
+            select=select
+        )
+        page = response.data or []
+
+        for report in page:
+            user = (report.pop("athletes", None) or {}).get("users") or {}
+
+            # Ages are calculated once per date of birth rather than once per report
+            dob = user.get("dob")
+            if dob not in ages:
+                ages[dob] = (today - datetime.strptime(dob, "%Y-%m-%d")).days // 365 if dob else None
+            report["athlete_age"] = ages[dob]
+            report["gender"] = user.get("gender")
+
+        if columns:
+            page = [{column: report.get(column) for column in columns} for report in page]
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        offset += page_size
+
+
+def json_stream(pages: Iterator[List[Dict]], key: str) -> Iterator[str]:
+    """Serialise pages as one JSON object, {key: [...]}, a page at a time."""
+    yield f'{{"{key}": ['
+    first = True
+    for page in pages:
+        for row in page:
+            yield ("" if first else ",") + json.dumps(row, default=str)
+            first = False
+    yield "]}"
+
+
+def ndjson_stream(pages: Iterator[List[Dict]]) -> Iterator[str]:
+    """Serialise pages as newline delimited JSON, one row per line."""
+    for page in pages:
+        yield "".join(json.dumps(row, default=str) + "\n" for row in page)
+
+
+def csv_stream(pages: Iterator[List[Dict]], columns: List[str] = None) -> Iterator[str]:
+    """Serialise pages as CSV, with a header taken from the columns or the first row."""
+    buffer = io.StringIO()
+    writer = None
+    for page in pages:
+        for row in page:
+            if writer is None:
+                writer = csv.DictWriter(
+                    buffer, fieldnames=columns or list(row), extrasaction="ignore")
+                writer.writeheader()
+            writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def compress_stream(chunks: Iterator[str], compression: str) -> Iterator[bytes]:
+    """
+    Compress a stream of text chunks as a single gzip or zstd file.
+
+    Args:
+        chunks (Iterator[str]): Text to compress.
+        compression (str): "gzip" or "zstd".
+    """
+    if compression == "gzip":
+        compressor = zlib.compressobj(wbits=31)
+    else:
+        compressor = zstandard.ZstdCompressor().compressobj()
+
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def columnar_available() -> bool:
+    """Whether pyarrow is installed, so columnar exports can be written."""
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands written bytes back in chunks as they are produced."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _columnar_schema(pa, table: str, columns: List[str]):
+    """
+    Schema for the whole export, from the known types of the table's columns.
+    Dictionary columns are encoded and columns of unknown type are typed as text.
+    """
+    arrow_types = {
+        "bool": pa.bool_(),
+        "int64": pa.int64(),
+        "timestamp": pa.timestamp("us", tz="UTC"),
+    }
+    types = {**COMMON_COLUMNAR_TYPES, **COLUMNAR_TYPES.get(table, {})}
+
+    fields = []
+    for column in columns:
+        if column in DICTIONARY_COLUMNS:
+            arrow_type = pa.dictionary(pa.int32(), pa.string())
+        else:
+            arrow_type = arrow_types.get(types.get(column), pa.string())
+        fields.append(pa.field(column, arrow_type))
+    return pa.schema(fields)
+
+
+def _columnar_value(value, text: bool):
+    """Value as written to a columnar export, with anything in a text column as text."""
+    if not text or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return str(value)
+
+
+def columnar_stream(pages: Iterator[List[Dict]], export_format: str, table: str) -> Iterator[bytes]:
+    """
+    Serialise pages as a compressed Parquet file, or an Arrow IPC stream, written a
+    row group at a time so only EXPORT_ROW_GROUP_SIZE rows are held in memory.
+
+    Args:
+        pages (Iterator[List[Dict]]): Pages of rows, as yielded by iter_report_pages.
+        export_format (str): "parquet" or "arrow".
+        table (str): The table the rows are from, whose column types are used.
+    """
+    # Imported here as pyarrow is large and only needed for analytics exports
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    writer = schema = None
+    pending = []
+
+    def write(rows):
+        nonlocal writer, schema
+        if schema is None:
+            # Every row has the same columns, whether all or a selection were requested
+            schema = _columnar_schema(pa, table, list(rows[0]))
+            if export_format == "parquet":
+                writer = pq.ParquetWriter(sink, schema, compression=COLUMNAR_COMPRESSION)
+            else:
+                writer = pa.ipc.new_stream(sink, schema, options=pa.ipc.IpcWriteOptions(
+                    compression=COLUMNAR_COMPRESSION, emit_dictionary_deltas=True))
+
+        arrays = []
+        for field in schema:
+            text = pa.types.is_string(field.type) or pa.types.is_dictionary(field.type)
+            values = [_columnar_value(row.get(field.name), text) for row in rows]
+            if field.name == "created_at":
+                values = [datetime.fromisoformat(value) if isinstance(value, str) else value
+                          for value in values]
+            arrays.append(pa.array(values, type=field.type))
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+    for page in pages:
+        pending.extend(page)
+        if len(pending) >= EXPORT_ROW_GROUP_SIZE:
+            write(pending)
+            pending = []
+            yield sink.drain()
+
+    if pending:
+        write(pending)
+    if writer is not None:
+        writer.close()
+    yield sink.drain()
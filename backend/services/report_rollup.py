@@ -0,0 +1,286 @@
+from services.database_service import DatabaseService
+from services.job_lock import job_lock
+from services import sqlite_store
+from collections import Counter
+from datetime import date, datetime, timezone
+from typing import Callable, Dict, List, Optional
+import sqlite3
+import time
+import os
+import click
+import logging
+
+logger = logging.getLogger(__name__)
+
+REPORT_ROLLUP_PATH = os.getenv("REPORT_ROLLUP_PATH", "report_rollup.db")
+
+# Rows fetched per page when rebuilding
+ROLLUP_PAGE_SIZE = int(os.getenv("ROLLUP_PAGE_SIZE", 1000))
+
+# Seconds a scheduled rebuild holds its lease, and after a successful rebuild during
+# which further triggers are no-ops
+ROLLUP_REBUILD_LEASE = int(os.getenv("ROLLUP_REBUILD_LEASE", 30 * 60))
+ROLLUP_REBUILD_WINDOW = int(os.getenv("ROLLUP_REBUILD_WINDOW", 60 * 60))
+
+# Report tables that are rolled up, by report type, main reports first
+REPORT_TABLES = {"report": "reports", "followup": "followup_reports"}
+
+# Upper age of each band, the last band is open ended
+AGE_BANDS = [(17, "U18"), (24, "18-24"), (34, "25-34")]
+OLDEST_AGE_BAND = "35+"
+
+# Team ID of the rows counting reports across all teams
+ALL_TEAMS = ""
+
+
+def paging_order(db_service: DatabaseService, table: str) -> str:
+    """
+    Order for paging through a report table. Reports can share a created_at, so
+    they are also ordered by the table's primary key, and no report is skipped or
+    repeated between pages.
+    """
+    key = db_service.primary_key(table)
+    if not key:
+        logger.warning(f"Paging {table} by created_at alone, reports created at the same time may repeat")
+    return ",".join(["created_at", *key])
+
+
+def age_band(dob: Optional[str], on: date) -> str:
+    """Age band of an athlete with the given date of birth, on the given day."""
+    if not dob:
+        return "Unknown"
+    age = (on - datetime.strptime(dob, "%Y-%m-%d").date()).days // 365
+    for upper, band in AGE_BANDS:
+        if age <= upper:
+            return band
+    return OLDEST_AGE_BAND
+
+
+class ReportRollup:
+    """
+    Daily counts of reports per team, status, age band and gender. Counts are
+    incremented as reports are submitted, so admin summaries read a few hundred
+    pre-aggregated rows instead of every report. Reports are counted once across
+    all teams (team_id "") and once for each team the athlete belongs to.
+
+    Increments are queued in memory, so some are lost if a worker dies, and the
+    file does not survive a redeploy. rebuild_all is run daily (see
+    .github/workflows/rollup.yml) to recount the rollup from the database.
+    """
+
+    def __init__(self, path: str = REPORT_ROLLUP_PATH):
+        self.path = path
+        self._db_service = None
+
+    @property
+    def db_service(self) -> DatabaseService:
+        if self._db_service is None:
+            self._db_service = DatabaseService()
+        return self._db_service
+
+    @staticmethod
+    def _create_tables(conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS report_rollup (
+                day TEXT NOT NULL,
+                report_type TEXT NOT NULL,
+                team_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                age_band TEXT NOT NULL,
+                gender TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (day, report_type, team_id, status, age_band, gender)
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS report_rollup_builds (
+                report_type TEXT PRIMARY KEY,
+                built_at REAL NOT NULL
+            )
+        """)
+
+    def _connect(self):
+        return sqlite_store.connect(self.path, self._create_tables)
+
+    @staticmethod
+    def _keys(report_type: str, report: dict) -> List[tuple]:
+        """Rollup keys for a report with its athlete's users and athlete_teams embedded."""
+        athlete = report.get("athletes") or {}
+        user = athlete.get("users") or {}
+        day = (report.get("created_at") or datetime.now(timezone.utc).isoformat())[:10]
+
+        dimensions = (
+            str(report.get("new_availability") or "Unknown"),
+            age_band(user.get("dob"), date.fromisoformat(day)),
+            user.get("gender") or "Unknown",
+        )
+        teams = [ALL_TEAMS] + [str(team["team_id"]) for team in athlete.get("athlete_teams") or []]
+        return [(day, report_type, team_id, *dimensions) for team_id in teams]
+
+    def _select(self) -> str:
+        athlete = self.db_service.embed(
+            "athletes",
+            self.db_service.embed("users", "dob", "gender"),
+            self.db_service.embed("athlete_teams", "team_id"))
+        return f"created_at, new_availability, {athlete}"
+
+    def record(self, report_type: str, athlete_id: str, status: str, created_at: str = None):
+        """
+        Count a newly submitted report.
+
+        Args:
+            report_type (str): "report" or "followup".
+            athlete_id (str): ID of the athlete who submitted the report.
+            status (str): The report's new_availability.
+            created_at (str): The report's ISO formatted creation timestamp.
+        """
+        athlete = self.db_service.fetch(
+            "athletes",
+            filters={"id": athlete_id},
+            select=f"{self.db_service.embed('users', 'dob', 'gender')}, "
+                   f"{self.db_service.embed('athlete_teams', 'team_id')}")
+
+        report = {
+            "created_at": created_at,
+            "new_availability": status,
+            "athletes": athlete.data[0] if athlete.data else None
+        }
+        with self._connect() as conn:
+            conn.executemany(
+                """INSERT INTO report_rollup VALUES (?, ?, ?, ?, ?, ?, 1)
+                   ON CONFLICT (day, report_type, team_id, status, age_band, gender)
+                   DO UPDATE SET count = count + 1""",
+                self._keys(report_type, report))
+
+    def rebuild(self, report_type: str, since: str = None) -> int:
+        """
+        Recount reports from the database, replacing the rollup rows they cover.
+
+        Args:
+            report_type (str): "report" or "followup".
+            since (str): Only rebuild days from this ISO date onwards. (default all days)
+
+        Returns:
+            Number of reports counted.
+        """
+        counts = Counter()
+        total = offset = 0
+        order = paging_order(self.db_service, REPORT_TABLES[report_type])
+        while True:
+            response = self.db_service.fetch(
+                REPORT_TABLES[report_type],
+                filters={"created_at": f"gte.{since}"} if since else None,
+                modifiers={
+                    "order": order,
+                    "range": (offset, offset + ROLLUP_PAGE_SIZE - 1)
+                },
+                select=self._select()
+            )
+            page = response.data or []
+            for report in page:
+                counts.update(self._keys(report_type, report))
+            total += len(page)
+            if len(page) < ROLLUP_PAGE_SIZE:
+                break
+            offset += ROLLUP_PAGE_SIZE
+
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "DELETE FROM report_rollup WHERE report_type = ? AND day >= ?",
+                    (report_type, since or ""))
+                conn.executemany(
+                    "INSERT INTO report_rollup VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(*key, count) for key, count in counts.items()])
+                if since is None:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO report_rollup_builds VALUES (?, ?)",
+                        (report_type, time.time()))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        logger.info(
+            f"Rebuilt {report_type} rollup from {total} reports into {len(counts)} rows")
+        return total
+
+    def rebuild_all(self, progress: Callable[..., None] = None) -> Dict:
+        """
+        Rebuild every report type, main reports first. Each type is rebuilt under
+        its own lease, and is skipped if another process is rebuilding it or it was
+        rebuilt within ROLLUP_REBUILD_WINDOW. A type that fails does not stop the
+        others from being rebuilt.
+
+        Args:
+            progress (callable): Optional callback, passed the reports counted so
+                far by report type.
+
+        Returns:
+            Dictionary of reports counted by report type, or "skipped".
+
+        Raises:
+            RuntimeError: If any report type failed to rebuild, after the others
+                have been rebuilt.
+        """
+        totals = {}
+        failed = []
+        for report_type in REPORT_TABLES:
+            try:
+                with job_lock.hold(f"report_rollup_rebuild:{report_type}",
+                                   ROLLUP_REBUILD_LEASE, ROLLUP_REBUILD_WINDOW) as lease:
+                    totals[report_type] = "skipped" if lease is None else self.rebuild(report_type)
+            except Exception as e:
+                logger.error(f"Error rebuilding {report_type} rollup: {e}")
+                failed.append(report_type)
+                continue
+            if progress:
+                progress(**totals)
+
+        if failed:
+            raise RuntimeError(f"Failed to rebuild {', '.join(failed)} rollup(s), rebuilt {totals}")
+        return totals
+
+    def is_built(self, report_type: str) -> bool:
+        """Whether the rollup has been fully built, so it covers every report."""
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT 1 FROM report_rollup_builds WHERE report_type = ?",
+                (report_type,)).fetchone() is not None
+
+    def rows(self, report_type: str, since: str, team_id: str = ALL_TEAMS) -> List[Dict]:
+        """
+        Rollup rows for one team, or all teams, from the given ISO date onwards.
+
+        Returns:
+            List of rows with day, status, age_band, gender and count.
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                """SELECT day, status, age_band, gender, count FROM report_rollup
+                   WHERE report_type = ? AND team_id = ? AND day >= ?
+                   ORDER BY day DESC""",
+                (report_type, team_id, since)).fetchall()
+        return [dict(row) for row in rows]
+
+
+report_rollup = ReportRollup()
+
+
+def init_rollup_cli(app):
+    """Register the `flask rollup rebuild` command for backfilling the report rollup."""
+
+    @app.cli.group("rollup")
+    def rollup_cli():
+        """Manage the daily report rollup."""
+
+    @rollup_cli.command("rebuild")
+    @click.option("--since", default=None, help="Only rebuild days from this date (YYYY-MM-DD).")
+    @click.option("--type", "report_type", type=click.Choice(sorted(REPORT_TABLES)),
+                  default=None, help="Only rebuild one report type.")
+    def rebuild(since, report_type):
+        """Recount reports from the database into the rollup."""
+        for rollup_type in [report_type] if report_type else REPORT_TABLES:
+            total = report_rollup.rebuild(rollup_type, since)
+            click.echo(f"Rebuilt {rollup_type} rollup from {total} reports")
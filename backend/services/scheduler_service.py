@@ -2,22 +2,58 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from services.database_service import DatabaseService
 from services.notification_service import NotificationService
+from services.push_receipt_service import push_receipt_service
+from services.job_lock import job_lock
+from services.report_rollup import report_rollup
+from postgrest import APIError
+from typing import Callable, Dict, List
+from zoneinfo import ZoneInfo, available_timezones
 import logging
-from datetime import date
+import random
+import time
+import os
+from datetime import datetime, timedelta, timezone
 
 logger = logging.getLogger(__name__)
 
+# Athletes fetched and sent reminders per page
+REMINDER_PAGE_SIZE = int(os.getenv("REMINDER_PAGE_SIZE", 500))
+
+# Seconds a reminder run holds its lease between pages, and after a successful run
+# during which further triggers (other workers' crons, GitHub Actions) are no-ops
+REMINDER_LEASE = int(os.getenv("REMINDER_LEASE", 600))
+REMINDER_RUN_WINDOW = int(os.getenv("REMINDER_RUN_WINDOW", 12 * 60 * 60))
+
+# Reminders are sent in timezone buckets of this many minutes. Every UTC offset is a
+# multiple of 15 minutes, so each timezone falls in exactly one bucket per day.
+REMINDER_BUCKET_MINUTES = int(os.getenv("REMINDER_BUCKET_MINUTES", 15))
+
+# Buckets missed within this many minutes (e.g. a late trigger) are still sent
+REMINDER_CATCHUP_MINUTES = int(os.getenv("REMINDER_CATCHUP_MINUTES", 60))
+
+# Optional random delay, in seconds, before a run starts, spreading runs across instances
+REMINDER_JITTER = int(os.getenv("REMINDER_JITTER", 0))
+
+# Timezone used for athletes who have not reported one
+DEFAULT_REMINDER_TIMEZONE = os.getenv("DEFAULT_REMINDER_TIMEZONE", "Europe/Dublin")
+
+# Postgres error code for a column that does not exist
+UNDEFINED_COLUMN = "42703"
+
 
 class SchedulerService:
     def __init__(self):
         self.scheduler = BackgroundScheduler()
         self.db_service = DatabaseService()
+        self.reminder_hour = 18
+        self.reminder_minute = 0
 
     def start(self):
         """Start the scheduler"""
         if not self.scheduler.running:
             self.scheduler.start()
             self.schedule_daily_reminders()
+            self.schedule_rollup_rebuild()
             logger.info("Scheduler started")
 
     def stop(self):
@@ -29,13 +65,18 @@ class SchedulerService:
     def schedule_daily_reminders(self, hour: int = 18, minute: int = 0):
         """
         Schedule a notification to be sent to athletes who have not submitted a report
-        for the day at the specified time.
+        for the day at the specified local time. The job runs every
+        REMINDER_BUCKET_MINUTES and each run only reminds athletes in the timezones
+        whose local reminder time has arrived.
 
         Args:
-            hour (int): Hour of the day to send notification
+            hour (int): Local hour of the day to send notification
             minute (int): Minute of the hour to send notification
         """
-        trigger = CronTrigger(hour=hour, minute=minute)
+        self.reminder_hour = hour
+        self.reminder_minute = minute
+
+        trigger = CronTrigger(minute=f"*/{REMINDER_BUCKET_MINUTES}", timezone=timezone.utc)
         self.scheduler.add_job(
             func=self._send_daily_reminders,
             trigger=trigger,
@@ -43,40 +84,169 @@ class SchedulerService:
             name="Send daily report reminders",
             replace_existing=True
         )
-        logger.info(f"Daily reminders scheduled for {hour:02d}:{minute:02d}")
+        logger.info(
+            f"Daily reminders scheduled for {hour:02d}:{minute:02d} local time, "
+            f"in {REMINDER_BUCKET_MINUTES} minute timezone buckets")
 
-    def _send_daily_reminders(self):
-        """Send the notifications to all relative athletes at scheduled time."""
-        try:
-            logger.info("Running daily reminder job...")
+    def schedule_rollup_rebuild(self, hour: int = 3, minute: int = 30):
+        """
+        Schedule a daily rebuild of the report rollup, restoring any counts lost
+        since the last rebuild.
+
+        Args:
+            hour (int): UTC hour of the day to rebuild
+            minute (int): Minute of the hour to rebuild
+        """
+        self.scheduler.add_job(
+            func=report_rollup.rebuild_all,
+            trigger=CronTrigger(hour=hour, minute=minute, timezone=timezone.utc),
+            id="report_rollup_rebuild",
+            name="Rebuild report rollup",
+            replace_existing=True
+        )
+        logger.info(f"Report rollup rebuild scheduled for {hour:02d}:{minute:02d} UTC")
+
+    def _bucket_timezones(self, bucket: datetime) -> List[str]:
+        """
+        Timezones whose local reminder time falls within the bucket starting at the
+        given UTC time.
+        """
+        target = self.reminder_hour * 60 + self.reminder_minute
+        timezones = []
+        for name in available_timezones():
+            local = bucket.astimezone(ZoneInfo(name))
+            if 0 <= local.hour * 60 + local.minute - target < REMINDER_BUCKET_MINUTES:
+                timezones.append(name)
+        return sorted(timezones)
 
-            athletes_response = self.db_service.fetch(
-                "athletes",
-                select="*, users(push_token)"
-            )
+    @staticmethod
+    def _recent_buckets(now: datetime) -> List[datetime]:
+        """Start times of the current bucket and any within the catch-up window, oldest first."""
+        current = now.replace(second=0, microsecond=0) - timedelta(
+            minutes=now.minute % REMINDER_BUCKET_MINUTES)
+        count = REMINDER_CATCHUP_MINUTES // REMINDER_BUCKET_MINUTES + 1
+        return [current - timedelta(minutes=REMINDER_BUCKET_MINUTES * i)
+                for i in reversed(range(count))]
 
-            if not athletes_response or not athletes_response.data:
-                logger.error(f"No athletes response or missing data.")
+    def _due_reminder_pages(self, timezones: List[str]):
+        """
+        Yield pages of athletes in the given timezones whose report is due and who
+        have a push token, filtered by the database and fetched with range requests.
+        Until users.timezone exists (migrations/001_add_users_timezone.sql), every
+        athlete is treated as being in DEFAULT_REMINDER_TIMEZONE.
+        """
+        timezone_filter = f"timezone.in.({','.join(timezones)})"
+        if DEFAULT_REMINDER_TIMEZONE in timezones:
+            timezone_filter += ",timezone.is.null"
+
+        offset = 0
+        while True:
+            modifiers = {
+                "filter": ("users.push_token", "not.is", "null"),
+                "order": "id",
+                "range": (offset, offset + REMINDER_PAGE_SIZE - 1)
+            }
+            if timezone_filter:
+                modifiers["or_"] = (timezone_filter, "users")
+
+            try:
+                response = self.db_service.fetch(
+                    "athletes",
+                    filters={"report_due": "true"},
+                    modifiers=modifiers,
+                    select=f"id, {self.db_service.embed('users', 'push_token', inner=True)}"
+                )
+            except APIError as e:
+                if e.code != UNDEFINED_COLUMN or not timezone_filter:
+                    raise
+                logger.warning(
+                    f"users.timezone is missing, reminding every athlete in {DEFAULT_REMINDER_TIMEZONE}. "
+                    f"Apply migrations/001_add_users_timezone.sql to send reminders by local time")
+                if DEFAULT_REMINDER_TIMEZONE not in timezones:
+                    return
+                timezone_filter = None
+                continue
+
+            page = response.data or []
+            if page:
+                yield page
+            if len(page) < REMINDER_PAGE_SIZE:
                 return
+            offset += REMINDER_PAGE_SIZE
 
-            athletes_data = athletes_response.data
-            logger.info(f"Processing {len(athletes_data)} athletes")
+    def _send_daily_reminders(self, progress: Callable[..., None] = None, now: datetime = None) -> Dict:
+        """
+        Send the notifications to athletes in every timezone bucket whose local
+        reminder time has arrived. Only one process sends a bucket, and a bucket
+        that has already been sent is skipped, so overlapping triggers are no-ops.
+
+        Args:
+            progress (callable): Optional callback, passed the running totals
+                after each page.
+            now (datetime): The time to run for, in UTC. (default the current time)
+
+        Returns:
+            Dictionary of totals: buckets sent and skipped, pages, athletes, sent,
+            failed and retried.
+        """
+        if REMINDER_JITTER:
+            time.sleep(random.uniform(0, REMINDER_JITTER))
 
-            sent = 0
+        totals = {"buckets": 0, "buckets_skipped": 0, "pages": 0, "athletes": 0,
+                  "sent": 0, "failed": 0, "retried": 0}
 
-            for athlete in athletes_data:
-                # Check if report is due
-                if athlete.get("report_due"):
-                    push_token = athlete.get("users", {}).get("push_token")
+        for bucket in self._recent_buckets(now or datetime.now(timezone.utc)):
+            timezones = self._bucket_timezones(bucket)
+            if not timezones:
+                continue
 
-                    if push_token and NotificationService.send_daily_reminder(push_token):
-                        sent += 1
-                        logger.info(
-                            f"Notification sent to athlete {athlete.get('id')}")
-                    else:
-                        logger.warning(
-                            f"Notification was NOT sent to athlete {athlete.get('id')}")
+            name = f"daily_report_reminders:{bucket:%Y-%m-%dT%H:%MZ}"
+            with job_lock.hold(name, REMINDER_LEASE, REMINDER_RUN_WINDOW) as lease:
+                if lease is None:
+                    totals["buckets_skipped"] += 1
+                    continue
+                self._run_daily_reminders(lease, timezones, totals, progress)
+                totals["buckets"] += 1
 
-            logger.info(f"Reminders sent: {sent}")
+        return totals
+
+    def _run_daily_reminders(self, lease, timezones: List[str], totals: Dict, progress: Callable[..., None] = None):
+        try:
+            logger.info(f"Running daily reminder job for {len(timezones)} timezone(s)...")
+            started = time.perf_counter()
+            athletes_sent = sent = failed = retried = 0
+
+            # Each page is sent before the next is fetched, so memory stays flat
+            for page_number, athletes in enumerate(self._due_reminder_pages(timezones), start=1):
+                page_started = time.perf_counter()
+                push_tokens = [athlete["users"]["push_token"] for athlete in athletes]
+
+                results = NotificationService.send_daily_reminders(push_tokens)
+                push_receipt_service.record(results["tickets"])
+
+                athletes_sent += len(athletes)
+                sent += results["sent"]
+                failed += results["failed"]
+                retried += results["retried"]
+
+                totals["pages"] += 1
+                totals["athletes"] += len(athletes)
+                for key in ("sent", "failed", "retried"):
+                    totals[key] += results[key]
+                logger.info(
+                    f"Reminder page {page_number}: {len(athletes)} athletes, sent: {results['sent']}, "
+                    f"failed: {results['failed']} in {time.perf_counter() - page_started:.2f}s")
+                if progress:
+                    progress(**totals)
+                if not lease.renew():
+                    raise RuntimeError("Reminder job lease lost, stopping to avoid duplicate sends")
+
+            logger.info(
+                f"Reminders sent: {sent}, failed: {failed}, retried: {retried} "
+                f"to {athletes_sent} athletes in {time.perf_counter() - started:.2f}s")
         except Exception as e:
             logger.error(f"Error sending reminders: {e}")
+            raise
+
+
+scheduler_service = SchedulerService()
@@ -1,13 +1,16 @@
 from services.database_service import DatabaseService
+from services.event_buffer import EventBuffer, session_event_buffer
 from datetime import datetime
+from typing import List
 import logging
 
 logger = logging.getLogger(__name__)
 
 
 class SessionService:
-    def __init__(self):
+    def __init__(self, event_buffer: EventBuffer = session_event_buffer):
         self.db_service = DatabaseService()
+        self.event_buffer = event_buffer
 
     def create_session(self, user_id: str) -> dict:
         """Create new session when a user logs in."""
@@ -37,10 +40,13 @@ class SessionService:
             logger.error(f"Error ending session {session_id}: {e}")
             raise e
 
-    def log_event(self, session_id: str, event_type: str, event_data: dict = None, endpoint: str = None) -> dict:
-        """Log an event during a session."""
+    def log_event(self, session_id: str, event_type: str, event_data: dict = None, endpoint: str = None):
+        """
+        Log an event during a session. Events are buffered and written in bulk by a
+        background thread, so this does not wait for the database.
+        """
         try:
-            response = self.db_service.insert("session_events", {
+            self.event_buffer.append({
                 "session_id": session_id,
                 "event_type": event_type,
                 "event_data": event_data,
@@ -49,8 +55,69 @@ class SessionService:
             })
             logger.info(
                 f"Event logged: {event_type} for session_id: {session_id}")
-            return response
         except Exception as e:
             logger.error(
                 f"Error logging event for session_id {session_id}: {e}")
             raise e
+
+    @staticmethod
+    def _validate_event(event) -> str:
+        """Return why an event cannot be logged, or None if it is valid."""
+        if not isinstance(event, dict):
+            return "Event must be an object"
+        for field in ("session_id", "event_type"):
+            if not isinstance(event.get(field), str) or not event.get(field):
+                return f"Missing {field}"
+        if event.get("event_data") is not None and not isinstance(event["event_data"], dict):
+            return "event_data must be an object"
+        if event.get("endpoint") is not None and not isinstance(event["endpoint"], str):
+            return "endpoint must be a string"
+        if event.get("timestamp") is not None:
+            try:
+                datetime.fromisoformat(event["timestamp"])
+            except (TypeError, ValueError):
+                return "timestamp must be an ISO 8601 string"
+        return None
+
+    def log_events(self, events: List[dict]) -> List[dict]:
+        """
+        Validate a batch of events and store the valid ones with a single bulk insert.
+
+        Args:
+            events (List[dict]): Events with session_id, event_type and optional
+                event_data, endpoint and client timestamp.
+
+        Returns:
+            One result per event, in order, with its status ("accepted" or "rejected")
+            and the reason for any rejection.
+
+        Raises:
+            Exception: If the bulk insert fails
+        """
+        now = datetime.now().isoformat()
+        results, rows = [], []
+
+        for index, event in enumerate(events):
+            error = self._validate_event(event)
+            if error:
+                results.append({"index": index, "status": "rejected", "error": error})
+                continue
+
+            rows.append({
+                "session_id": event["session_id"],
+                "event_type": event["event_type"],
+                "event_data": event.get("event_data") or {},
+                "endpoint": event.get("endpoint"),
+                "timestamp": event.get("timestamp") or now,
+            })
+            results.append({"index": index, "status": "accepted"})
+
+        try:
+            if rows:
+                self.db_service.insert("session_events", rows)
+            logger.info(
+                f"Logged {len(rows)} of {len(events)} events in one batch")
+            return results
+        except Exception as e:
+            logger.error(f"Error logging batch of {len(rows)} events: {e}")
+            raise e
@@ -0,0 +1,35 @@
+from contextlib import contextmanager
+from typing import Callable, Iterator
+import sqlite3
+import threading
+
+# Tables are created once per file and store in each process
+_created = set()
+_lock = threading.Lock()
+
+
+@contextmanager
+def connect(path: str, create_tables: Callable[[sqlite3.Connection], None] = None) -> Iterator[sqlite3.Connection]:
+    """
+    Open a local SQLite file shared by every gunicorn worker on the host. The
+    connection is in autocommit mode, so writes that must be atomic begin their
+    own transaction, and rows are returned as sqlite3.Row.
+
+    Args:
+        path (str): Path of the SQLite file.
+        create_tables (callable): Creates the caller's tables if they do not
+            exist. Called on the first connection to the file. (default None)
+    """
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    try:
+        if create_tables is not None:
+            key = (path, create_tables.__qualname__)
+            if key not in _created:
+                with _lock:
+                    if key not in _created:
+                        create_tables(conn)
+                        _created.add(key)
+        yield conn
+    finally:
+        conn.close()
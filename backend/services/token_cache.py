@@ -0,0 +1,185 @@
+from services import sqlite_store
+from cachetools import TLRUCache
+import hashlib
+import sqlite3
+import threading
+import time
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 1024))
+TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", 300))
+
+# Tokens revoked on logout or account deletion, shared by every gunicorn worker on the host
+TOKEN_REVOCATION_PATH = os.getenv("TOKEN_REVOCATION_PATH", "token_revocations.db")
+
+
+class TokenCache:
+    """
+    Bounded LRU cache of verified access tokens. Entries are keyed by a hash of the
+    bearer token, so raw tokens are never held in memory, and expire at whichever
+    comes first: the token's own expiry or the configured TTL.
+
+    Each worker has its own cache, so revoking a token only evicts it locally.
+    Revocations are also recorded in a SQLite file shared by every worker and
+    checked on each cache hit, so other workers stop accepting the token from
+    their cache straight away. A revocation is kept for the TTL, after which no
+    worker can still hold the token.
+    """
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE, ttl: int = TOKEN_CACHE_TTL,
+                 revocation_path: str = TOKEN_REVOCATION_PATH):
+        self.ttl = ttl
+        self.revocation_path = revocation_path
+        self._cache = TLRUCache(maxsize=maxsize, ttu=self._time_to_use, timer=time.time)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revoked = 0
+
+    @staticmethod
+    def _create_tables(conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS revoked_tokens (
+                token_hash TEXT PRIMARY KEY,
+                expires_at REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS revoked_users (
+                user_id TEXT PRIMARY KEY,
+                revoked_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+
+    def _connect(self):
+        return sqlite_store.connect(self.revocation_path, self._create_tables)
+
+    def _time_to_use(self, key, value, now):
+        expires_at = value[2]
+        if expires_at is None:
+            return now + self.ttl
+        return min(expires_at, now + self.ttl)
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str):
+        """
+        Look up a previously verified token.
+
+        Args:
+            token (str): The bearer token presented by the client.
+
+        Returns:
+            Tuple of (user, user_id) if cached and not revoked, None otherwise.
+        """
+        key = self._key(token)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+        if self._is_revoked(key, entry[1], entry[3]):
+            with self._lock:
+                self._cache.pop(key, None)
+                self.revoked += 1
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return entry[0], entry[1]
+
+    def _is_revoked(self, key: str, user_id: str, cached_at: float) -> bool:
+        """
+        Whether a cached token was revoked by any worker: the token itself, or every
+        token its user held when it was cached. If the revocation list cannot be read
+        the entry is treated as revoked, so the token is verified again.
+        """
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    """SELECT 1 FROM revoked_tokens WHERE token_hash = ? AND expires_at > ?
+                       UNION ALL
+                       SELECT 1 FROM revoked_users WHERE user_id = ? AND revoked_at >= ? AND expires_at > ?
+                       LIMIT 1""",
+                    (key, now, user_id, cached_at, now)).fetchone()
+            return row is not None
+        except sqlite3.Error as e:
+            logger.error(f"Error reading token revocations: {e}")
+            return True
+
+    def _revoke(self, statement: str, params: tuple, description: str):
+        """Record a revocation for every worker, dropping revocations that have expired."""
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM revoked_tokens WHERE expires_at <= ?", (now,))
+                conn.execute("DELETE FROM revoked_users WHERE expires_at <= ?", (now,))
+                conn.execute(statement, params)
+        except sqlite3.Error as e:
+            logger.error(f"Error recording revocation of {description}: {e}")
+
+    def set(self, token: str, user, user_id: str, expires_at: float = None):
+        """
+        Cache a verified token.
+
+        Args:
+            token (str): The bearer token that was verified.
+            user: The resolved user stored on flask.g.
+            user_id (str): The resolved user ID.
+            expires_at (float): The token's expiry as a UNIX timestamp, if known.
+        """
+        if expires_at is not None and expires_at <= time.time():
+            return
+        with self._lock:
+            self._cache[self._key(token)] = (user, user_id, expires_at, time.time())
+
+    def evict(self, token: str):
+        """Remove a single token from the cache in every worker, e.g. on logout."""
+        key = self._key(token)
+        with self._lock:
+            self._cache.pop(key, None)
+        now = time.time()
+        self._revoke(
+            """INSERT INTO revoked_tokens (token_hash, expires_at) VALUES (?, ?)
+               ON CONFLICT (token_hash) DO UPDATE SET expires_at = excluded.expires_at""",
+            (key, now + self.ttl), "a token")
+
+    def evict_user(self, user_id: str):
+        """Remove every cached token belonging to a user in every worker, e.g. on account deletion."""
+        with self._lock:
+            keys = [key for key, entry in self._cache.items() if entry[1] == user_id]
+            for key in keys:
+                self._cache.pop(key, None)
+        now = time.time()
+        self._revoke(
+            """INSERT INTO revoked_users (user_id, revoked_at, expires_at) VALUES (?, ?, ?)
+               ON CONFLICT (user_id) DO UPDATE
+               SET revoked_at = excluded.revoked_at, expires_at = excluded.expires_at""",
+            (user_id, now, now + self.ttl), f"tokens for user {user_id}")
+        logger.info(f"Evicted {len(keys)} cached token(s) for user {user_id}")
+
+    def stats(self) -> dict:
+        """
+        Hit/miss counters for the cache. Each hit is one token verification saved,
+        and revoked counts cached entries rejected because their token had been revoked.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._cache),
+                "maxsize": self._cache.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "revoked": self.revoked,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
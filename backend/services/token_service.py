@@ -0,0 +1,140 @@
+from dotenv import load_dotenv
+import jwt
+import requests
+import threading
+import time
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+JWKS_REFRESH_INTERVAL = int(os.getenv("JWKS_REFRESH_INTERVAL", 600))
+
+# Minimum seconds between key set fetches, so tokens with unknown key IDs (e.g.
+# forged tokens) cannot keep the refresher fetching back to back
+JWKS_MIN_REFRESH_INTERVAL = int(os.getenv("JWKS_MIN_REFRESH_INTERVAL", 30))
+
+
+class UnknownSigningKeyError(Exception):
+    """Raised when a token is signed with a key that is not in the cached key set."""
+
+
+class TokenService:
+    """
+    Singleton service to verify Supabase access tokens locally. The project's
+    signing keys are fetched from the Supabase Auth JWKS endpoint, cached in memory
+    and refreshed by a background thread, so verifying a token does not require a
+    round-trip to Supabase Auth.
+
+    Verification mode is set through AUTH_VERIFICATION_MODE ("local" or "remote").
+    Legacy HS256 projects can set SUPABASE_JWT_SECRET to verify symmetric tokens.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            # Create and initialise the singleton instance
+            cls._instance = super().__new__(cls)
+            cls._instance._initialise()
+        return cls._instance
+
+    def _initialise(self):
+        load_dotenv()
+        self.mode = os.getenv("AUTH_VERIFICATION_MODE", "local").lower()
+        self.jwks_url = f"{os.getenv('SUPABASE_URL')}/auth/v1/.well-known/jwks.json"
+        self.jwt_secret = os.getenv("SUPABASE_JWT_SECRET")
+        self.audience = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+
+        self._keys = {}
+        self._lock = threading.Lock()
+        self._refresh_requested = threading.Event()
+        self._refresh_thread = None
+        self._last_refresh = None
+
+    @property
+    def local_enabled(self) -> bool:
+        return self.mode == "local"
+
+    def refresh_keys(self):
+        """Fetch the current signing key set from Supabase Auth and replace the cache."""
+        self._last_refresh = time.monotonic()
+        try:
+            response = requests.get(self.jwks_url, timeout=5)
+            response.raise_for_status()
+            jwk_set = jwt.PyJWKSet.from_dict(response.json())
+
+            keys = {jwk.key_id: jwk for jwk in jwk_set.keys if jwk.key_id}
+            with self._lock:
+                self._keys = keys
+            logger.info(f"Signing keys refreshed: {len(keys)} key(s) cached")
+
+        except (requests.exceptions.RequestException, jwt.PyJWKSetError, ValueError) as e:
+            # Keep serving the previous key set, unknown keys fall back to remote
+            logger.error(f"Error refreshing signing keys: {e}")
+
+    def _refresh_due(self) -> bool:
+        """Whether enough time has passed since the last fetch to fetch the keys again."""
+        return (self._last_refresh is None
+                or time.monotonic() - self._last_refresh >= JWKS_MIN_REFRESH_INTERVAL)
+
+    def _refresh_loop(self):
+        while True:
+            self.refresh_keys()
+            self._refresh_requested.wait(timeout=JWKS_REFRESH_INTERVAL)
+            # Requests arriving while the keys were just fetched wait for the minimum interval
+            if not self._refresh_due():
+                time.sleep(JWKS_MIN_REFRESH_INTERVAL - (time.monotonic() - self._last_refresh))
+            self._refresh_requested.clear()
+
+    def _ensure_refresh_thread(self):
+        # Started lazily so each gunicorn worker runs its own refresher
+        if self._refresh_thread is None:
+            with self._lock:
+                if self._refresh_thread is None:
+                    self._refresh_thread = threading.Thread(
+                        target=self._refresh_loop, name="jwks-refresh", daemon=True)
+                    self._refresh_thread.start()
+
+    def verify(self, token: str) -> dict:
+        """
+        Verify an access token's signature, expiry and audience against the cached keys.
+
+        Args:
+            token (str): The bearer token presented by the client.
+
+        Returns:
+            Dictionary of the token's verified claims.
+
+        Raises:
+            UnknownSigningKeyError: If the token's key is not in the cached key set.
+            jwt.InvalidTokenError: If the token is invalid or expired.
+        """
+        self._ensure_refresh_thread()
+
+        header = jwt.get_unverified_header(token)
+        algorithm = header.get("alg")
+        kid = header.get("kid")
+
+        if algorithm == "HS256":
+            if not self.jwt_secret:
+                raise UnknownSigningKeyError("HS256 token but SUPABASE_JWT_SECRET is not set")
+            key = self.jwt_secret
+        else:
+            with self._lock:
+                jwk = self._keys.get(kid)
+
+            if jwk is None:
+                # Keys may have been rotated, refresh ahead of schedule
+                if self._refresh_due():
+                    self._refresh_requested.set()
+                raise UnknownSigningKeyError(f"Unknown signing key ID: {kid}")
+            key = jwk.key
+            algorithm = jwk.algorithm_name
+
+        return jwt.decode(
+            token,
+            key,
+            algorithms=[algorithm],
+            audience=self.audience,
+            options={"require": ["exp", "sub"]}
+        )
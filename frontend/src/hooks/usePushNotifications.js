@@ -23,6 +23,7 @@ export const usePushNotifications = () => {
       await apiClient.post(`/api/notifications/register`, {
         user_id: uuid,
         push_token: token,
+        timezone: Intl.DateTimeFormat().resolvedOptions().timeZone,
       });
     } catch (error) {
       console.error("Failed to store push token to backend");
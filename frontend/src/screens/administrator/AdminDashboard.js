@@ -82,7 +82,7 @@ export default function AdminDashScreen() {
 
       // Get report outcome summary data
       const reportsResponse = await apiClient.get(
-        `/api/admin/all_reports/?days=7`
+        `/api/admin/all_reports/?days=7&summary_only=true`
       );
 
       if (reportsResponse) {
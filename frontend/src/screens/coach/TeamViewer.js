@@ -24,26 +24,24 @@ export default function TeamViewerScreen({ route }) {
           `/api/teams/get_athletes/${team.team_id}`
         );
 
-        // Fetch time since last report for each athlete
-        const athleteLastReport = await Promise.all(
-          response.data.athletes.map(async (athlete) => {
-            try {
-              const timeResponse = await apiClient.get(
-                `/api/health/get_recent_report/${athlete.athlete_id}`
-              );
-              return {
-                ...athlete,
-                timeSinceReport: timeResponse.data || "No report submitted"
-              };
-            } catch (error) {
-              console.error(`Error fetching most recent report for athlete ${athlete.athlete_id}:`, error);
-              return {
-                ...athlete,
-                timeSinceReport: "No report data"
-              };
-            }
-          })
-        );
+        // Fetch time since last report for the whole team
+        let recentReports = {};
+        try {
+          const recentResponse = await apiClient.get(
+            `/api/health/recent_reports/${team.team_id}`
+          );
+          recentReports = recentResponse.data.recent_reports || {};
+        } catch (error) {
+          console.error(`Error fetching most recent reports for team ${team.team_id}:`, error);
+        }
+
+        const athleteLastReport = response.data.athletes.map((athlete) => {
+          const recent = recentReports[athlete.athlete_id];
+          return {
+            ...athlete,
+            timeSinceReport: recent ? recent.time_since : "No report data"
+          };
+        });
 
         athleteLastReport.sort((a, b) => {
           const surnameA = a.name.split(' ').pop();